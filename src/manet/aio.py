@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+from threading import Lock, Thread
+import time
+import weakref
+
+from manet.hint_router import HintRouter
+
+
+class Receiver:
+    """
+    One thread receiving for every AsyncTransceiver of an event loop and
+    handing frames to their queues on the loop. The radio transceivers
+    only offer blocking receives, so it sweeps them without blocking and
+    then waits idle_ratio times as long as the sweep took, so it spends at
+    most 1/(1 + idle_ratio) of a core sweeping, and at least idle_wait
+    seconds after a sweep that found nothing. Routers on the loop sleep
+    until a frame, a wake up or their next deadline.
+    """
+    def __init__(self, loop, *, idle_wait=0.001, idle_ratio=10):
+        self.__loop = loop
+        self.__idle_wait = idle_wait
+        self.__idle_ratio = idle_ratio
+        self.__lock = Lock()
+        self.__inboxes = {} # transceiver: asyncio.Queue of its router
+        self.__thread = None
+
+    def add(self, transceiver, inbox):
+        with self.__lock:
+            self.__inboxes[transceiver] = inbox
+            if self.__thread is None: # exits once every one is closed
+                self.__thread = Thread(target=self.__run, daemon=True)
+                self.__thread.start()
+
+    def __run(self):
+        while True:
+            with self.__lock:
+                inboxes = list(self.__inboxes.items())
+                if not inboxes:
+                    self.__thread = None
+                    return
+            start = time.perf_counter()
+            received = []
+            for trx, inbox in inboxes:
+                try:
+                    data = trx.recv(timeout=0)
+                except EOFError: # closed, None stops its router
+                    with self.__lock:
+                        del self.__inboxes[trx]
+                    data = None
+                if data is None or len(data) > 0:
+                    received.append((inbox, data))
+            wait = self.__idle_ratio*(time.perf_counter() - start)
+            if received: # one hand-off to the loop per sweep
+                self.__loop.call_soon_threadsafe(deliver, received)
+            else:
+                wait = max(wait, self.__idle_wait)
+            time.sleep(wait)
+
+def deliver(received):
+    for inbox, data in received:
+        inbox.put_nowait(data)
+
+# loop: its Receiver
+receivers = weakref.WeakKeyDictionary()
+
+def get_receiver(loop):
+    try:
+        return receivers[loop]
+    except KeyError:
+        r = receivers[loop] = Receiver(loop)
+        return r
+
+
+class AsyncTransceiver:
+    """
+    Awaitable view of a radio.Transceiver, fed by the Receiver of its
+    loop once opened. Apart from close, must be used from the loop.
+    """
+    def __init__(self, transceiver, receiver):
+        self.__trx = transceiver
+        self.__receiver = receiver
+        self.__inbox = None # frames, b"" wakes and None stops
+
+    async def open(self):
+        # the queue belongs to the running loop
+        self.__inbox = asyncio.Queue()
+        self.__receiver.add(self.__trx, self.__inbox)
+
+    def wake(self):
+        if self.__inbox is not None: # not opened yet, nothing to wake
+            self.__inbox.put_nowait(b"")
+
+    def send(self, data):
+        return self.__trx.send(data)
+
+    async def recv(self, timeout=None):
+        try:
+            data = await asyncio.wait_for(self.__inbox.get(), timeout)
+        except asyncio.TimeoutError:
+            return b""
+        if data is None:
+            raise EOFError("transceiver closed")
+        return data
+
+    def close(self):
+        self.__trx.close()
+
+
+class AsyncHintRouter(HintRouter):
+    """
+    HintRouter driven by a coroutine on an asyncio event loop instead of
+    its own threads, so one loop can run the routers of a whole process.
+    The loop may run in another thread than the one creating the router,
+    frames reach it through the loop's Receiver (see get_receiver).
+    """
+    def __init__(self, *, loop, receiver=None, **kwargs):
+        self.__loop = loop
+        self.__trx = AsyncTransceiver(
+                kwargs["transceiver"],
+                get_receiver(loop) if receiver is None else receiver)
+        super().__init__(**kwargs)
+
+    def start(self):
+        self.__future = asyncio.run_coroutine_threadsafe(
+                self.run(), self.__loop)
+
+    def wake(self):
+        self.__loop.call_soon_threadsafe(self.__trx.wake)
+
+    def close(self):
+        self.__trx.close()
+        try:
+            in_loop = asyncio.get_running_loop() is self.__loop
+        except RuntimeError: # no running loop in this thread
+            in_loop = False
+        if not in_loop: # would deadlock waiting on ourselves
+            self.__future.result()
+
+    async def run(self):
+        await self.__trx.open()
+        timeout = 0
+        while True:
+            try:
+                if timeout < 0:
+                    timeout = 0
+                raw_data = await self.__trx.recv(timeout=timeout)
+            except EOFError:
+                return
+            frames, timeout = self.step(raw_data)
+            for frame in frames:
+                self.__trx.send(frame)
@@ -1,11 +1,16 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import asyncio
 import math
+import os
 from multiprocessing import Barrier, Process, Queue
 import pickle
 import queue
 import random as rand
+import shutil
+import tempfile
+import threading
 from threading import Thread
 import time
 import uuid
@@ -15,9 +20,25 @@ from hmap.std import Node
 from hmap.std.matching import TopicBasedMatcher
 from hmap.std.routing import GossipRouter
 
-from manet.context import RouterContext, SimulationContext, Clock, Vehicle
+from manet.context import RouterContext, SimulationContext, Clock
 from manet import radio
+from manet.aio import AsyncHintRouter
+from manet.cache import InterestCache
+from manet.codec import codecs
+from manet.destinations import Bloom, Destinations
+from manet.evaluation import average_latency
 from manet.hint_router import HintRouter
+from manet.mobility import Mobility
+from manet.partition import (
+        cross_partition_traffic, owner, rebalance_plan, 
+        round_robin_partition)
+from manet.results import publish_results
+from manet.shm import ShmLogQueue, ShmRing
+from manet.simulator import (
+        Medium, SimHintRouter, SimTransceiver, Simulator, VirtualClock)
+from manet.spatial import GridIndex
+from manet.stats import merge_stats
+from manet.trace import TraceRecorder, trace_logs
 
 
 
@@ -34,14 +55,34 @@ def random_waveform_worker(*,
         create_router,
         sub_logs_q,
         pub_logs_q,
-        trx_logs_q):
+        trx_logs_q,
+        stats_q=None,
+        migrations=()): # [(t, node ids run here from t on)], by time
+    # the k-th migration restarts nodes as incarnation k of their router,
+    # the same number in every process as they all get every migration
     clock = Clock(speed=clock_speed)
-    trxs = {}
-    vehicles = {}
+    mobility = Mobility(paths)
     routers = {}
-    for nid in node_ids:
-        x, y = (paths[nid][0][0], paths[nid][0][1])
-        v = Vehicle(x, y)
+    nodes = {}
+    # deserialized interests shared by every router in this process
+    interest_cache = InterestCache()
+    # event loop shared by routers that do not need their own threads
+    loop = asyncio.new_event_loop()
+    loop_thread = Thread(target=loop.run_forever)
+    loop_thread.start()
+
+    # SUBSCRIPTIONS
+    def get_callback():
+        def cb(t, msg):
+            cb.log.append((clock.time, msg))
+        cb.log = []
+        return cb
+    subscriptions = {}
+    sub_logs = {}
+    stats = {}
+
+    def start_node(nid, incarnation=0):
+        v = mobility.vehicle(nid)
         # context
         sim_context = SimulationContext(clock=clock, vehicle=v)
         router_context = RouterContext(clock=clock, vehicle=v, uid=nid)
@@ -52,113 +93,150 @@ def random_waveform_worker(*,
         router = create_router(
                 context=router_context,
                 matcher=matcher,
-                transceiver=trx)
+                transceiver=trx,
+                interest_cache=interest_cache,
+                loop=loop,
+                incarnation=incarnation)
         # component stores
-        trxs[nid] = trx
-        vehicles[nid] = v
         routers[nid] = router
-    nodes = {nid: Node(r) for nid, r in routers.items()}    
+        nodes[nid] = Node(router)
+        if nid in subs:
+            subscriptions[nid] = [
+                    nodes[nid].subscribe(t, get_callback()) 
+                    for t in subs[nid]]
+
+    def stop_node(nid):
+        # a node that migrates starts over with a new router elsewhere
+        nodes.pop(nid).close()
+        router = routers.pop(nid)
+        add_router_stats(stats, router_stats({nid: router}))
+        for s in subscriptions.pop(nid, ()):
+            topics = sub_logs.setdefault(nid, {})
+            topics.setdefault(s.topic, []).extend(s.callback.log)
 
-    # SUBSCRIPTIONS
-    def get_callback():
-        def cb(t, msg):
-            cb.log.append((clock.time, msg))
-        cb.log = []
-        return cb
-    subscriptions = {nid: [] for nid in subs.keys()}
-    for nid, topics in subs.items():
-        subscriptions[nid] = [
-                nodes[nid].subscribe(t, get_callback()) 
-                for t in topics]
+    pub_logs = {}
+    def publish_due(until):
+        # publishes everything due before until
+        while len(pubs) > 0 and pubs[0][2] < until:
+            nid, topic, t = pubs.pop(0)
+            tc = clock.time
+            nodes[nid].publish(topic, (nid, tc)) #TODO make publish non-sleeping
+            try:
+                pub_logs[nid].append((topic, tc))
+            except KeyError:
+                pub_logs[nid] = [(topic, tc)]
+
+    for nid in node_ids:
+        start_node(nid)
+    migrations = list(migrations)
+    incarnation = 0
     #BARRIER
     start_barrier.wait()
     clock.start()
-    pub_logs = {}
     while clock.time < simulation_duration: # run for duration of simulation
         clock.sleep(0.001)
-        if len(pubs) > 0:
-            nid, topic, t = pubs[0]
-            tc = clock.time
-            # new item to publish
-            if t < tc:
-                nodes[nid].publish(topic, (nid, tc)) #TODO make publish non-sleeping
-                try:
-                    pub_logs[nid].append((topic, tc))
-                except KeyError:
-                    pub_logs[nid] = [(topic, tc)]
-                pubs.pop(0) # success, remove item!
-        for nid in node_ids:
-            path = paths[nid]
-            tc = clock.time
-            x1, y1, t1 = path[1]
-            while tc > t1:
-                path.pop(0)
-                x1, y1, t1 = path[1]
-            x0, y0, t0 = path[0]
-            r = (tc - t0)/(t1 - t0) 
-            x = x0 + r*(x1 - x0)
-            y = y0 + r*(y1 - y0)
-            v = vehicles[nid]
-            v.set_x(x)
-            v.set_x_vel((x1 - x0)/(t1 - t0))
-            v.set_y(y)
-            v.set_y_vel((y1 - y0)/(t1 - t0))
+        tc = clock.time
+        while migrations and migrations[0][0] <= tc: # rebalance
+            t, nids = migrations.pop(0)
+            incarnation += 1
+            publish_due(t) # by nodes leaving at t too
+            nids = set(nids)
+            for nid in [nid for nid in nodes if nid not in nids]:
+                stop_node(nid)
+            for nid in sorted(nids - set(nodes)):
+                start_node(nid, incarnation)
+        publish_due(tc)
+        mobility.step(tc)
     # clean-up
-    for n in nodes.values():
-        n.close()
+    for nid in list(nodes):
+        stop_node(nid)
+    loop.call_soon_threadsafe(loop.stop)
+    loop_thread.join()
+    loop.close()
+    if isinstance(trx_logs_q, TraceRecorder):
+        trx_logs_q.close() # write out buffered records
 
     # collect log data
-    sub_logs = {}
-    for nid, s_list in subscriptions.items():
-        sub_logs[nid] = {s.topic: s.callback.log for s in s_list}
-
-    send_logs = {}
-    for nid, t in trxs.items():
-        send_logs[nid] = t.send_log
-
-    recv_logs = {}
-    for nid, t in trxs.items():
-        recv_logs[nid] = t.recv_log
-
     pub_logs_q.put(pub_logs)
     sub_logs_q.put(sub_logs)
+    if stats_q is not None:
+        stats_q.put(stats)
+
+def router_stats(routers):
+    # stats of every router that keeps them, hive-map's routers do not
+    return {
+            nid: r.stats for nid, r in routers.items() 
+            if hasattr(r, "stats")}
+
+def add_router_stats(stats, more):
+    # a node that migrated between processes ran several routers, their
+    # counters and histograms add up, other stats are the last one's
+    for nid, s in more.items():
+        try:
+            old = stats[nid]
+        except KeyError:
+            stats[nid] = s
+        else:
+            stats[nid] = {**s, **merge_stats((old, s))}
+
+def add_logs(logs, more):
+    # merges pub ({nid: [...]}) or sub ({nid: {topic: [...]}}) logs of a
+    # node that ran in several processes, in time order
+    for nid, log in more.items():
+        if isinstance(log, dict):
+            topics = logs.setdefault(nid, {})
+            for topic, entries in log.items():
+                topics[topic] = sorted(
+                        topics.get(topic, []) + entries, key=lambda e: e[0])
+        else:
+            logs[nid] = sorted(
+                    logs.get(nid, []) + log, key=lambda e: e[-1])
 
-def create_gossip_router(**kwargs):
-    return HintRouter(**kwargs, beacon_interval=5, credit=2)
+# radio max_buffer_size, routers keep their frames within it
+mtu = 1024
+
+def create_gossip_router(*, interest_cache, loop, mtu=mtu, **kwargs):
+    return HintRouter(
+            **kwargs, beacon_interval=5, credit=2, mtu=mtu,
+            interest_cache=interest_cache)
     #return GossipRouter(**kwargs, gossip_level=1)
 
-def random_waveform_benchmark():
-    title = "hint_2_seed_47"
-    rand.seed(47)
+def create_hmap_gossip_router(*, 
+        interest_cache, loop, gossip_level=1, incarnation=0, **kwargs):
+    # GossipRouter keeps no state across restarts that needs incarnation
+    return GossipRouter(**kwargs, gossip_level=gossip_level)
+
+def create_async_router(*, interest_cache, loop, mtu=mtu, **kwargs):
+    # same protocol as create_gossip_router, all routers on one thread
+    return AsyncHintRouter(
+            **kwargs, beacon_interval=5, credit=2, mtu=mtu,
+            interest_cache=interest_cache, loop=loop)
+
+def random_waveform_scenario(*, 
+        seed=47, num_nodes=100, radio_range=75, simulation_duration=125,
+        vehicle_speed=(10, 20)): # meters per second
+    rand.seed(seed)
     # PARAMETERS
-    # VEHICLE
-    vehicle_speed = (10, 20) # meters per second
     # BOUNDARY
     x_bound = (0, 1000) # meters
     y_bound = (0, 1000) #meters
-    # TIME
-    clock_speed = 0.5# second per second
-    simulation_duration = 125 #60 # seconds
     # PARTICIPANTS
     # two publishers
     # first 20 publish
     #pubs = [(i%100, 1, i//2 + 0.2) for i in range(120)]
-    pubs = [(i, 1, i*2 + 0.2) for i in range(60)]
+    pubs = [(i % num_nodes, 1, i*2 + 0.2) for i in range(60)]
     # 10 subscribers
     #subs = {i: [1] for i in range(20, 30)} # node i is interested in topic 1
-    subs = {i: [1] for i in range(60, 70)} # node i is interested in topic 1
-    node_ids = list(range(100))
-    #node_ids = list(range(10))
-    # MULTIPROCESSING
-    num_processes = 4
-    start_barrier = Barrier(num_processes)
+    # node i is interested in topic 1
+    subs = {i % num_nodes: [1] for i in range(60, 70)}
+    node_ids = list(range(num_nodes))
     # TRANSCEIVER
     trx_kwargs = {
             "world": str(uuid.uuid4()),
             "data_rate": 2000, #kbps
-            "send_range": 75,
-            "recv_range": 75,
-            "max_buffer_size": 1024
+            "send_range": radio_range,
+            "recv_range": radio_range,
+            "max_buffer_size": mtu
     }
     paths = {}
     for nid in node_ids:
@@ -173,10 +251,78 @@ def random_waveform_benchmark():
             next_t = distance/speed + t
             path.append((next_x, next_y, next_t))
         paths[nid] = path
+    return {
+            "node_ids": node_ids,
+            "subs": subs,
+            "pubs": pubs,
+            "paths": paths,
+            "trx_kwargs": trx_kwargs,
+            "simulation_duration": simulation_duration,
+            "params": {
+                "seed": seed,
+                "num_nodes": num_nodes,
+                "radio_range": radio_range,
+                "simulation_duration": simulation_duration,
+                "vehicle_speed": list(vehicle_speed)}
+    }
+
+def result_name(scenario, medium):
+    # hint routers of create_gossip_router, named like sweep.config_name
+    # plus the medium so the two benchmarks and a sweep never collide
+    p = scenario["params"]
+    return (
+            f"hint_2_seed_{p['seed']}_b5_n{p['num_nodes']}"
+            f"_r{p['radio_range']}_{medium}")
+
+def random_waveform_benchmark(*, num_processes=None, rebalance_interval=None):
+    """
+    Runs the scenario on num_processes worker processes (one per core, at
+    most one per node, by default) that each run a spatial region's
+    nodes. With rebalance_interval, regions are recomputed that often and
+    nodes that change region migrate to the new process, starting over
+    with a new router there.
+    """
+    scenario = random_waveform_scenario(seed=47)
+    title = result_name(scenario, "realtime")
+    node_ids = scenario["node_ids"]
+    subs = scenario["subs"]
+    pubs = scenario["pubs"]
+    paths = scenario["paths"]
+    trx_kwargs = scenario["trx_kwargs"]
+    simulation_duration = scenario["simulation_duration"]
+    # TIME
+    clock_speed = 0.5# second per second
+    # MULTIPROCESSING
+    if num_processes is None:
+        num_processes = min(os.cpu_count() or 4, len(node_ids))
+    # group nodes by region so radio neighbors mostly share a process,
+    # raises ValueError for more processes than nodes
+    plan = rebalance_plan(
+            paths, num_processes, 
+            interval=rebalance_interval, duration=simulation_duration)
+    partitions = plan[0][1]
+    # create_async_router runs each process' routers on one event loop
+    create_router = create_gossip_router
+    # "shm" moves trace records through a shared memory ring per worker
+    # instead of pickling them through one Queue, "trace" has each worker
+    # write them to its own file (level "full" keeps payloads for the logs)
+    transport = "shm"
+    start_barrier = Barrier(num_processes)
 
     pub_logs_q = Queue()
     sub_logs_q = Queue()
-    trx_logs_q = Queue()
+    stats_q = Queue()
+    if transport == "shm":
+        trx_logs_qs = [ShmLogQueue(ShmRing()) for _ in partitions]
+    elif transport == "trace":
+        os.makedirs(f"{title}_trace", exist_ok=True)
+        trx_logs_qs = [
+                TraceRecorder(
+                    os.path.join(f"{title}_trace", f"worker_{i}.trace"),
+                    level="full")
+                for i in range(len(partitions))]
+    else:
+        trx_logs_qs = [Queue()]*len(partitions)
     workers = []
     ###########################################################################
     '''
@@ -200,21 +346,25 @@ def random_waveform_benchmark():
     recv_logs = {}
     '''
     ############################################################################
-    for i in range(num_processes):
-        nids = node_ids[i::num_processes] # divy up nodes
+    for i, (nids, trx_logs_q) in enumerate(zip(partitions, trx_logs_qs)):
         p_kwargs = {
                 "start_barrier": start_barrier,
                 "node_ids": nids,
-                "subs": {nid: v for nid, v in subs.items() if nid in nids},
-                "pubs": [(nid, t, pt) for nid, t, pt in pubs if nid in nids],
-                "paths": {nid: v for nid, v in paths.items() if nid in nids},
+                "subs": subs,
+                # published by whichever process runs the node at the time
+                "pubs": [
+                    (nid, t, pt) for nid, t, pt in pubs 
+                    if owner(plan, nid, pt) == i],
+                "paths": paths,
                 "clock_speed": clock_speed,
                 "simulation_duration": simulation_duration,
                 "trx_kwargs": trx_kwargs,
-                "create_router": create_gossip_router,
+                "create_router": create_router,
                 "sub_logs_q": sub_logs_q,
                 "pub_logs_q": pub_logs_q,
-                "trx_logs_q": trx_logs_q
+                "trx_logs_q": trx_logs_q,
+                "stats_q": stats_q,
+                "migrations": [(t, parts[i]) for t, parts, m in plan[1:]]
         }
         p = Process(target=random_waveform_worker, kwargs=p_kwargs)
         workers.append(p)
@@ -222,72 +372,477 @@ def random_waveform_benchmark():
         w.start()
     send_logs = {nid: [] for nid in node_ids}
     recv_logs = {nid: [] for nid in node_ids}
+    consumers = list({id(q): q for q in trx_logs_qs}.values())
+    if transport == "trace":
+        consumers = [] # read back from the files once workers are done
     while any([w.is_alive() for w in workers]):
-        try:
-            channel, nid, time, data = trx_logs_q.get(timeout=0.25)
-            if channel == "send": 
-                send_logs[nid].append((time, data))
-            elif channel == "recv":
-                recv_logs[nid].append((time, data))
-            else:
-                assert False
-        except queue.Empty:
-            pass
+        if drain_trx_logs(consumers, send_logs, recv_logs) == 0:
+            time.sleep(0.01)
 
     # wait to join processes
     for w in workers:
         w.join()
 
-
-    while not trx_logs_q.empty:
-        channel, nid, time, data = trx_logs_q.get(timeout=0.25)
-        if channel == "send": 
-            send_logs[nid].append((time, data))
-        elif channel == "recv":
-            recv_logs[nid].append((time, data))
-        else:
-            assert False
+    drain_trx_logs(consumers, send_logs, recv_logs)
+    if transport == "shm":
+        for q in trx_logs_qs:
+            q.ring.close()
+    elif transport == "trace":
+        traced = trace_logs([q.path for q in trx_logs_qs])
+        for nid, log in traced["send"].items():
+            send_logs[nid] = log
+        for nid, log in traced["recv"].items():
+            recv_logs[nid] = log
     print("JOINED WORKERS")
 
+    # migrated nodes have logs and stats from several processes
     pub_logs = {}
     while not pub_logs_q.empty():
-        pub_logs = {**pub_logs, **pub_logs_q.get()}
+        add_logs(pub_logs, pub_logs_q.get())
 
     sub_logs = {}
     while not sub_logs_q.empty():
-        sub_logs = {**sub_logs, **sub_logs_q.get()}
+        add_logs(sub_logs, sub_logs_q.get())
+
+    stats = {}
+    while not stats_q.empty():
+        add_router_stats(stats, stats_q.get())
+
+    logs = {
+            "pub": pub_logs,
+            "sub": sub_logs,
+            "send": send_logs,
+            "recv": recv_logs,
+            "paths": paths,
+            "stats": stats
+        }
+    print_logs(logs)
+    print_partition_traffic(
+            logs, 
+            plan, 
+            reach=trx_kwargs["send_range"] + trx_kwargs["recv_range"], 
+            duration=simulation_duration)
+    # a rerun replaces the previous result
+    publish_results(
+            "./results", title, logs, 
+            {"title": title, "medium": "realtime", **scenario["params"]},
+            replace=True)
+    print("ALL DONE :)")
+
+    return
+
+def drain_trx_logs(trx_logs_qs, send_logs, recv_logs):
+    # moves every record waiting in the queues into the logs
+    count = 0
+    for trx_logs_q in trx_logs_qs:
+        while True:
+            try:
+                channel, nid, t, data = trx_logs_q.get_nowait()
+            except queue.Empty:
+                break
+            if channel == "send": 
+                send_logs[nid].append((t, data))
+            elif channel == "recv":
+                recv_logs[nid].append((t, data))
+            else:
+                assert False
+            count += 1
+    return count
+
+def print_partition_traffic(logs, plan, *, reach, duration):
+    # deliveries that cross process boundaries with the plan the run used
+    # and with the alternatives
+    num_parts = len(plan[0][1])
+    node_ids = list(logs["paths"])
+    rebalanced = rebalance_plan(
+            logs["paths"], num_parts, interval=10, duration=duration)
+    plans = {
+        "this run": plan,
+        "round-robin": [(0, round_robin_partition(node_ids, num_parts))],
+        "spatial": [(0, plan[0][1])],
+        "spatial, rebalanced every 10 s": rebalanced
+    }
+    for name, p in plans.items():
+        cross, total = cross_partition_traffic(logs, p, reach)
+        print(f"Cross-Partition Deliveries ({name}): {cross}/{total}")
+    migrations = sum(m for t, parts, m in plan)
+    print(f"Rebalance Migrations (this run): {migrations}")
 
+def print_logs(logs):
     print("PUB LOGS")
-    for nid, data in pub_logs.items():
+    for nid, data in logs["pub"].items():
         print(f"{nid}: {data}")
     print("\n")
     print("SUB LOGS")
-    for nid, topics in sub_logs.items():
+    for nid, topics in logs["sub"].items():
         print(f"{nid}")
         for t, log in topics.items():
             print(f"\t{t}: {len(log)}")
     print("\n")
     total_bytes = 0
     num_sends = 0
-    for nid, log in send_logs.items():
+    for nid, log in logs["send"].items():
         total_bytes += sum([len(data) for t, data in log])
         num_sends += len(log)
         #print(f"{nid}: {total_bytes}")
     print(f"Bytes Transmitted: {total_bytes}")
     print(f"Num Sends: {num_sends}")
+    # publish -> deliver, same metric as evaluation.plot_latency
+    print(f"Average Latency: {average_latency(logs)}")
+    if logs.get("stats"): # totals over every router
+        stats = merge_stats(logs["stats"].values())
+        for name, n in sorted(stats["counters"].items()):
+            print(f"{name}: {n}")
+        for name, h in sorted(stats["histograms"].items()):
+            print(f"{name}: n={h['count']} mean={h['mean']} max={h['max']}")
+
+def create_sim_router(*, 
+        interest_cache, simulator, beacon_interval=5, credit=2, mtu=mtu,
+        **kwargs):
+    # same protocol as create_gossip_router, driven by simulator events
+    return SimHintRouter(
+            **kwargs, beacon_interval=beacon_interval, credit=credit, 
+            mtu=mtu, interest_cache=interest_cache, simulator=simulator)
+
+def random_waveform_realtime(*, scenario, create_router, clock_speed=0.5):
+    # threaded run of a scenario in this process, for routers that bring
+    # their own threads and cannot be driven by a Simulator
+    pub_logs_q = queue.SimpleQueue()
+    sub_logs_q = queue.SimpleQueue()
+    trx_logs_q = queue.SimpleQueue()
+    stats_q = queue.SimpleQueue()
+    random_waveform_worker(
+            start_barrier=threading.Barrier(1),
+            node_ids=scenario["node_ids"],
+            subs=scenario["subs"],
+            pubs=list(scenario["pubs"]),
+            paths=scenario["paths"],
+            clock_speed=clock_speed,
+            simulation_duration=scenario["simulation_duration"],
+            trx_kwargs=scenario["trx_kwargs"],
+            create_router=create_router,
+            sub_logs_q=sub_logs_q,
+            pub_logs_q=pub_logs_q,
+            trx_logs_q=trx_logs_q,
+            stats_q=stats_q)
+    send_logs = {nid: [] for nid in scenario["node_ids"]}
+    recv_logs = {nid: [] for nid in scenario["node_ids"]}
+    drain_trx_logs([trx_logs_q], send_logs, recv_logs)
+    return {
+            "pub": pub_logs_q.get(),
+            "sub": sub_logs_q.get(),
+            "send": send_logs,
+            "recv": recv_logs,
+            "paths": scenario["paths"],
+            "stats": stats_q.get()
+        }
 
-    logs = {
+def random_waveform_simulation(*, 
+        scenario, create_router=create_sim_router, mobility_interval=0.01):
+    # discrete-event run of a scenario in this process, deterministic for a
+    # given scenario and as fast as the cpu allows
+    simulator = Simulator()
+    clock = VirtualClock(simulator)
+    trx_logs_q = queue.SimpleQueue()
+    interest_cache = InterestCache()
+    mobility = Mobility(scenario["paths"])
+    medium = Medium(simulator, **scenario["trx_kwargs"])
+    # receivers are looked up in a grid with cells as large as radio reach
+    medium.index = GridIndex(mobility.node_ids, medium.range)
+    routers = {}
+    nodes = {}
+    for nid in scenario["node_ids"]:
+        v = mobility.vehicle(nid)
+        # context
+        sim_context = SimulationContext(clock=clock, vehicle=v)
+        router_context = RouterContext(clock=clock, vehicle=v, uid=nid)
+        # hive-map components
+        matcher = TopicBasedMatcher("FlatInt", "PyObj")
+        trx = SimTransceiver(
+                nid, trx_logs_q, medium=medium, context=sim_context)
+        router = create_router(
+                context=router_context,
+                matcher=matcher,
+                transceiver=trx,
+                interest_cache=interest_cache,
+                simulator=simulator)
+        routers[nid] = router
+        nodes[nid] = Node(router)
+
+    # SUBSCRIPTIONS
+    def get_callback():
+        def cb(t, msg):
+            cb.log.append((clock.time, msg))
+        cb.log = []
+        return cb
+    subscriptions = {}
+    for nid, topics in scenario["subs"].items():
+        subscriptions[nid] = [
+                nodes[nid].subscribe(t, get_callback()) 
+                for t in topics]
+
+    # PUBLICATIONS
+    pub_logs = {}
+    def publish(nid, topic):
+        tc = clock.time
+        nodes[nid].publish(topic, (nid, tc))
+        try:
+            pub_logs[nid].append((topic, tc))
+        except KeyError:
+            pub_logs[nid] = [(topic, tc)]
+    for nid, topic, t in scenario["pubs"]:
+        simulator.schedule(t, publish, nid, topic)
+
+    # MOBILITY
+    def move():
+        mobility.step(clock.time)
+        medium.index.update(mobility.x, mobility.y)
+        simulator.schedule(clock.time + mobility_interval, move)
+    move()
+
+    clock.start()
+    simulator.run(until=scenario["simulation_duration"])
+    for n in nodes.values():
+        n.close()
+
+    sub_logs = {}
+    for nid, s_list in subscriptions.items():
+        sub_logs[nid] = {s.topic: s.callback.log for s in s_list}
+    send_logs = {nid: [] for nid in scenario["node_ids"]}
+    recv_logs = {nid: [] for nid in scenario["node_ids"]}
+    while not trx_logs_q.empty():
+        channel, nid, time, data = trx_logs_q.get()
+        if channel == "send": 
+            send_logs[nid].append((time, data))
+        elif channel == "recv":
+            recv_logs[nid].append((time, data))
+    return {
             "pub": pub_logs,
             "sub": sub_logs,
             "send": send_logs,
             "recv": recv_logs,
-            "paths": paths
+            "paths": scenario["paths"],
+            "stats": router_stats(routers)
         }
-    with open(f"{title}.pickle", "xb") as f:
-        pickle.dump(logs, f)
+
+def random_waveform_simulation_benchmark():
+    scenario = random_waveform_scenario(seed=47)
+    title = result_name(scenario, "des")
+    start = time.perf_counter()
+    logs = random_waveform_simulation(scenario=scenario)
+    print(f"Wall Time: {time.perf_counter() - start:.1f} s")
+    print_logs(logs)
+    # a rerun replaces the previous result
+    publish_results(
+            "./results", title, logs, 
+            {"title": title, "medium": "des", **scenario["params"]},
+            replace=True)
     print("ALL DONE :)")
 
-    return
+def mobility_benchmark():
+    rand.seed(47)
+    repeats = 200
+    print(f"{'nodes':>8}{'step us':>12}")
+    for num_nodes in (100, 1000, 10000):
+        paths = {}
+        for nid in range(num_nodes):
+            t = 0
+            path = []
+            while t <= 130:
+                path.append((rand.uniform(0, 1000), rand.uniform(0, 1000), t))
+                t += rand.uniform(30, 90)
+            path.append((rand.uniform(0, 1000), rand.uniform(0, 1000), t))
+            paths[nid] = path
+        mobility = Mobility(paths)
+        start = time.perf_counter()
+        for i in range(repeats):
+            mobility.step(125*i/repeats)
+        step = (time.perf_counter() - start)/repeats*1e6
+        print(f"{num_nodes:>8}{step:>12.1f}")
+
+def transport_producer(trx_logs_q, nid, num_frames, frame_size):
+    data = bytes(frame_size)
+    for i in range(num_frames):
+        trx_logs_q.put(("send", nid, i/num_frames, data))
+    if isinstance(trx_logs_q, TraceRecorder):
+        trx_logs_q.close()
+
+def transport_benchmark():
+    # trace records from producer processes to one consumer: Queue, ShmRing
+    # and per-process TraceRecorder files merged afterwards
+    num_frames = 20000
+    frame_size = 64 # typical encoded HintRouter frame
+    print(f"{'transport':<12}{'procs':>6}{'frames/s':>12}{'MB/s':>8}")
+    for num_processes in (4, 8, 16):
+        for transport in ("queue", "shm", "trace"):
+            if transport == "shm":
+                qs = [ShmLogQueue(ShmRing()) for _ in range(num_processes)]
+            elif transport == "trace":
+                trace_dir = tempfile.mkdtemp()
+                qs = [
+                        TraceRecorder(
+                            os.path.join(trace_dir, f"worker_{i}.trace"),
+                            level="full")
+                        for i in range(num_processes)]
+            else:
+                qs = [Queue()]*num_processes
+            workers = [
+                    Process(
+                        target=transport_producer,
+                        args=(q, nid, num_frames, frame_size))
+                    for nid, q in enumerate(qs)]
+            send_logs = {nid: [] for nid in range(num_processes)}
+            consumers = list({id(q): q for q in qs}.values())
+            expected = num_processes*num_frames
+            start = time.perf_counter()
+            for w in workers:
+                w.start()
+            received = 0
+            if transport == "trace":
+                for w in workers:
+                    w.join()
+                received = sum(
+                        len(log) for log in
+                        trace_logs([q.path for q in qs])["send"].values())
+                shutil.rmtree(trace_dir)
+            while received < expected:
+                received += drain_trx_logs(consumers, send_logs, {})
+            elapsed = time.perf_counter() - start
+            for w in workers:
+                w.join()
+            if transport == "shm":
+                for q in qs:
+                    q.ring.close()
+            rate = expected/elapsed
+            mb = rate*frame_size/1e6
+            print(f"{transport:<12}{num_processes:>6}{rate:>12.0f}{mb:>8.1f}")
+
+def beacon_benchmark():
+    # fixed 5 s beacons against adaptive ones, for moving and slow nodes;
+    # adaptive hints age every beacon_interval seconds, 5 s here as well
+    variants = {
+        "fixed 5 s": {"beacon_interval": 5},
+        "adaptive 1-10 s": {
+            "beacon_interval": 5,
+            "adaptive_beacon": True,
+            "min_beacon_interval": 1,
+            "max_beacon_interval": 10,
+            "suppress_beacons": False},
+        "+ suppression": {
+            "beacon_interval": 5,
+            "adaptive_beacon": True,
+            "min_beacon_interval": 1,
+            "max_beacon_interval": 10}
+    }
+    print(
+            f"{'speed m/s':<11}{'beaconing':<17}{'sent':>6}{'skipped':>9}"
+            f"{'airtime ms':>12}{'reliability':>13}{'latency':>9}")
+    for speed in ((10, 20), (0.5, 1)):
+        scenario = random_waveform_scenario(seed=47, vehicle_speed=speed)
+        data_rate = scenario["trx_kwargs"]["data_rate"]
+        num_pubs = len(scenario["pubs"])
+        for name, router_kwargs in variants.items():
+            routers = []
+            def create_router(**kwargs):
+                router = SimHintRouter(
+                        **kwargs, **router_kwargs, credit=2, mtu=mtu)
+                routers.append(router)
+                return router
+            logs = random_waveform_simulation(
+                    scenario=scenario, create_router=create_router)
+            stats = [r.stats for r in routers]
+            beacons = [s["beacons"] for s in stats]
+            sent = sum(s["counters"]["beacons_out"] for s in stats)
+            skipped = sum(b["suppressed"] for b in beacons)
+            airtime = 8*sum(b["bytes"] for b in beacons)/data_rate # ms
+            deliveries = sum(
+                    len(log) for topics in logs["sub"].values() 
+                    for log in topics.values())
+            reliability = deliveries/len(logs["sub"])/num_pubs
+            print(
+                    f"{str(speed):<11}{name:<17}{sent:>6}{skipped:>9}"
+                    f"{airtime:>12.1f}{reliability:>13.3f}"
+                    f"{average_latency(logs):>9.3f}")
+
+def destinations_benchmark():
+    # a forwarding node's work per message: decode, merge matched neighbors
+    # into the destination list, encode again; the list holds a quarter of
+    # the network as it would once a message has spread
+    rand.seed(47)
+    repeats = 200
+    codec = codecs["binary"]()
+    raw_event = pickle.dumps((1, (42, 63.25)))
+    print(f"{'nodes':>8}  {'destinations':<18}{'bytes':>8}{'cpu us':>10}")
+    for num_nodes in (100, 1000, 10000):
+        carried = {
+                nid: rand.randrange(11) 
+                for nid in rand.sample(range(num_nodes), num_nodes//4)}
+        nbrs = rand.sample(range(num_nodes), 20)
+        hints = [rand.randrange(11) for _ in nbrs]
+        variants = {
+            "dict": carried,
+            "indexed": Destinations.from_dict(carried),
+            "indexed+cap+bloom": Destinations.from_dict(
+                carried, bloom=Bloom(1024), max_size=64)
+        }
+        for name, destinations in variants.items():
+            msg = ("message", ((3, 7), destinations, 2, raw_event))
+            data = codec.encode([msg])
+            start = time.perf_counter()
+            for _ in range(repeats):
+                (channel, (mid, d, credit, raw)), = codec.decode(data)
+                if isinstance(d, dict):
+                    for nid, last in zip(nbrs, hints):
+                        try:
+                            if d[nid] > last:
+                                d[nid] = last
+                        except KeyError:
+                            d[nid] = last
+                else:
+                    d.max_size = destinations.max_size
+                    if destinations.bloom is not None and d.bloom is None:
+                        d.bloom = Bloom(1024)
+                    d, lowest = d.merge(nbrs, hints)
+                codec.encode([("message", (mid, d, credit, raw))])
+            cpu = (time.perf_counter() - start)/repeats*1e6
+            print(f"{num_nodes:>8}  {name:<18}{len(data):>8}{cpu:>10.1f}")
+
+def codec_benchmark():
+    rand.seed(47)
+    repeats = 2000
+    # frames shaped like those seen in random_waveform_benchmark
+    raw_event = pickle.dumps((1, (42, 63.25)))
+    raw_interests = tuple(pickle.dumps(t) for t in range(3))
+    frames = {
+        "beacon": [("beacon", (57, 3, 0xdeadbeef, raw_interests))],
+        "delta": [("delta", (57, 4, 0xfeedface, 3, raw_interests[:1], ()))],
+        "message": [("message", (
+            (12, 345), 
+            {rand.randrange(100): rand.randrange(11) for _ in range(8)},
+            2,
+            raw_event))],
+        "batch": [("beacon", (57, 3, 0xdeadbeef, raw_interests))] + [
+            ("message", (
+                (rand.randrange(100), i), 
+                {rand.randrange(100): rand.randrange(11) for _ in range(20)},
+                1,
+                raw_event))
+            for i in range(6)]
+    }
+    print(f"{'codec':<8}{'frame':<10}{'bytes':>8}{'enc us':>10}{'dec us':>10}")
+    for name, Codec in codecs.items():
+        codec = Codec()
+        for kind, messages in frames.items():
+            data = codec.encode(messages)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                codec.encode(messages)
+            enc = (time.perf_counter() - start)/repeats*1e6
+            start = time.perf_counter()
+            for _ in range(repeats):
+                codec.decode(data)
+            dec = (time.perf_counter() - start)/repeats*1e6
+            print(f"{name:<8}{kind:<10}{len(data):>8}{enc:>10.2f}{dec:>10.2f}")
 
 
 
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from threading import Lock
+
+
+class InterestCache:
+    """
+    Bounded LRU of raw interest bytes to deserialized interests. Safe to
+    share between routers (and their threads) in the same process, so a raw
+    interest beaconed by many neighbors is deserialized once.
+    """
+    def __init__(self, max_size=4096):
+        self.__max_size = max_size
+        self.__lock = Lock()
+        self.__interests = OrderedDict() # (Interest, raw): interest
+        self.__hits = 0
+        self.__misses = 0
+
+    def __len__(self):
+        return len(self.__interests)
+
+    def deserialize(self, Interest, raw_interest):
+        key = (Interest, raw_interest)
+        with self.__lock:
+            try:
+                interest = self.__interests[key]
+            except KeyError:
+                self.__misses += 1
+            else:
+                self.__hits += 1
+                self.__interests.move_to_end(key)
+                return interest
+        # deserialize outside of lock, racing threads do duplicate work
+        interest = Interest.deserialize(raw_interest)
+        with self.__lock:
+            self.__interests[key] = interest
+            if len(self.__interests) > self.__max_size:
+                self.__interests.popitem(last=False)
+        return interest
+
+    @property
+    def stats(self):
+        return {
+                "size": len(self.__interests),
+                "hits": self.__hits,
+                "misses": self.__misses
+        }
@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Frame codecs for HintRouter. A frame is a sequence of (channel, content)
+messages; codecs turn it into bytes for the radio and back. Malformed
+frames raise ValueError on decode.
+
+Binary frame layout (varint = unsigned LEB128):
+    frame:   varint count, message*
+    message: type byte, body
+    MESSAGE: varint origin, varint counter, varint n, (varint id, u8 hint)*n,
+             varint credit, varint len, raw-event
+    BEACON:  varint nid, varint version, u32 digest,
+             varint n, (varint len, raw-interest)*n
+    DELTA:   varint nid, varint version, u32 digest, varint base,
+             varint n, (varint len, added-interest)*n,
+             varint m, (varint len, removed-interest)*m
+    FRAGMENT: varint nid, varint seq, varint index, varint count,
+             varint len, chunk (of an encoded frame, see packer.py)
+    INDEXED: MESSAGE whose destinations are a Destinations:
+             varint origin, varint counter, varint n, varint id-gap*n,
+             u8 hint*n, varint bloom-bytes, [u8 k, bloom], varint credit,
+             varint len, raw-event
+    DIGEST:  varint nid, varint version, u32 digest (a beacon without its
+             interests, piggybacked on data frames)
+"""
+
+from itertools import chain
+import pickle
+import struct
+
+import numpy as np
+
+from manet.destinations import Bloom, Destinations
+
+MESSAGE = 0
+BEACON = 1
+DELTA = 2
+FRAGMENT = 3
+INDEXED = 4
+DIGEST = 5
+
+u32 = struct.Struct("<I")
+
+
+def encode_varint(n, out):
+    if n < 0:
+        raise ValueError(f"varint must be non-negative: {n}")
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def decode_varint(data, i):
+    n = 0
+    shift = 0
+    while True:
+        try:
+            b = data[i]
+        except IndexError:
+            raise ValueError("truncated varint") from None
+        i += 1
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, i
+        shift += 7
+        if shift > 63:
+            raise ValueError("varint too long")
+
+def encode_bytes(b, out):
+    encode_varint(len(b), out)
+    out += b
+
+def decode_bytes(data, i):
+    n, i = decode_varint(data, i)
+    j = i + n
+    if j > len(data):
+        raise ValueError("truncated bytes")
+    return bytes(data[i:j]), j
+
+def encode_bytes_list(items, out):
+    encode_varint(len(items), out)
+    for b in items:
+        encode_bytes(b, out)
+
+def decode_bytes_list(data, i):
+    n, i = decode_varint(data, i)
+    items = []
+    for _ in range(n):
+        b, i = decode_bytes(data, i)
+        items.append(b)
+    return tuple(items), i
+
+def encode_u32(n, out):
+    out += u32.pack(n)
+
+def decode_u32(data, i):
+    try:
+        return u32.unpack_from(data, i)[0], i + 4
+    except struct.error:
+        raise ValueError("truncated u32") from None
+
+
+class PickleCodec:
+    """ original wire format, only safe between trusted peers """
+    def encode(self, messages):
+        return pickle.dumps(tuple(messages))
+
+    def decode(self, data):
+        try:
+            return pickle.loads(data)
+        except Exception as e:
+            raise ValueError(f"malformed frame: {e}") from e
+
+
+class BinaryCodec:
+    """ struct-packed format, requires integer node ids and bytes payloads """
+    def encode(self, messages):
+        out = bytearray()
+        encode_varint(len(messages), out)
+        for channel, content in messages:
+            if channel == "message" and isinstance(content[1], Destinations):
+                out.append(INDEXED)
+                self.encode_indexed(content, out)
+            elif channel == "message":
+                out.append(MESSAGE)
+                self.encode_message(content, out)
+            elif channel == "beacon":
+                out.append(BEACON)
+                self.encode_beacon(content, out)
+            elif channel == "delta":
+                out.append(DELTA)
+                self.encode_delta(content, out)
+            elif channel == "fragment":
+                out.append(FRAGMENT)
+                self.encode_fragment(content, out)
+            elif channel == "digest":
+                out.append(DIGEST)
+                self.encode_digest(content, out)
+            else:
+                raise ValueError(f"unknown channel: {channel}")
+        return bytes(out)
+
+    def decode(self, data):
+        messages = []
+        count, i = decode_varint(data, 0)
+        for _ in range(count):
+            try:
+                kind = data[i]
+            except IndexError:
+                raise ValueError("truncated frame") from None
+            i += 1
+            if kind == MESSAGE:
+                content, i = self.decode_message(data, i)
+                messages.append(("message", content))
+            elif kind == BEACON:
+                content, i = self.decode_beacon(data, i)
+                messages.append(("beacon", content))
+            elif kind == DELTA:
+                content, i = self.decode_delta(data, i)
+                messages.append(("delta", content))
+            elif kind == FRAGMENT:
+                content, i = self.decode_fragment(data, i)
+                messages.append(("fragment", content))
+            elif kind == INDEXED:
+                content, i = self.decode_indexed(data, i)
+                messages.append(("message", content))
+            elif kind == DIGEST:
+                content, i = self.decode_digest(data, i)
+                messages.append(("digest", content))
+            else:
+                raise ValueError(f"unknown message type: {kind}")
+        if i != len(data):
+            raise ValueError("trailing bytes in frame")
+        return messages
+
+    def encode_message(self, content, out):
+        mid, destinations, credit, raw_event = content
+        origin, counter = mid
+        encode_varint(origin, out)
+        encode_varint(counter, out)
+        encode_varint(len(destinations), out)
+        if destinations and min(destinations) >= 0 and max(destinations) < 0x80:
+            # every id is a single-byte varint, pack pairs in one go
+            out += bytes(chain.from_iterable(destinations.items()))
+        else:
+            for nid, hint in destinations.items():
+                encode_varint(nid, out)
+                out.append(hint) # raises ValueError above 255
+        encode_varint(credit, out)
+        encode_bytes(raw_event, out)
+
+    def decode_message(self, data, i):
+        origin, i = decode_varint(data, i)
+        counter, i = decode_varint(data, i)
+        n, i = decode_varint(data, i)
+        j = i + 2*n
+        ids = data[i:j:2]
+        if len(ids) == n and (n == 0 or max(ids) < 0x80) and j <= len(data):
+            # all ids are single-byte varints so pairs are fixed width
+            destinations = dict(zip(ids, data[i + 1:j:2]))
+            i = j
+        else:
+            destinations = {}
+            for _ in range(n):
+                nid, i = decode_varint(data, i)
+                try:
+                    destinations[nid] = data[i]
+                except IndexError:
+                    raise ValueError("truncated destinations") from None
+                i += 1
+        credit, i = decode_varint(data, i)
+        raw_event, i = decode_bytes(data, i)
+        return ((origin, counter), destinations, credit, raw_event), i
+
+    def encode_indexed(self, content, out):
+        mid, destinations, credit, raw_event = content
+        origin, counter = mid
+        encode_varint(origin, out)
+        encode_varint(counter, out)
+        ids = destinations.ids
+        encode_varint(len(ids), out)
+        gaps = np.diff(ids, prepend=0)
+        if len(gaps) == 0 or (gaps.min() >= 0 and gaps.max() < 0x80):
+            out += gaps.astype(np.uint8).tobytes() # single-byte varints
+        else:
+            for gap in gaps.tolist():
+                encode_varint(gap, out) # raises ValueError on negative ids
+        out += destinations.hints.tobytes()
+        bloom = destinations.bloom
+        if bloom is None:
+            encode_varint(0, out)
+        else:
+            encode_varint(len(bloom.data), out)
+            out.append(bloom.k)
+            out += bloom.data.tobytes()
+        encode_varint(credit, out)
+        encode_bytes(raw_event, out)
+
+    def decode_indexed(self, data, i):
+        origin, i = decode_varint(data, i)
+        counter, i = decode_varint(data, i)
+        n, i = decode_varint(data, i)
+        gaps = np.frombuffer(data, dtype=np.uint8, count=min(n, len(data) - i),
+                offset=i)
+        if len(gaps) == n and (n == 0 or gaps.max() < 0x80):
+            ids = np.cumsum(gaps, dtype=np.int64)
+            i += n
+        else:
+            ids = np.empty(n, dtype=np.int64)
+            nid = 0
+            for j in range(n):
+                gap, i = decode_varint(data, i)
+                nid += gap
+                ids[j] = nid
+        if i + n > len(data):
+            raise ValueError("truncated hints")
+        hints = np.frombuffer(data, dtype=np.uint8, count=n, offset=i).copy()
+        i += n
+        size, i = decode_varint(data, i)
+        bloom = None
+        if size > 0:
+            if i + 1 + size > len(data):
+                raise ValueError("truncated bloom filter")
+            k = data[i]
+            try:
+                bloom = Bloom(8*size, k, data[i + 1:i + 1 + size])
+            except ValueError as e:
+                raise ValueError(f"malformed bloom filter: {e}") from e
+            i += 1 + size
+        credit, i = decode_varint(data, i)
+        raw_event, i = decode_bytes(data, i)
+        destinations = Destinations(ids, hints, bloom=bloom)
+        return ((origin, counter), destinations, credit, raw_event), i
+
+    def encode_beacon(self, content, out):
+        nid, version, digest, raw_interests = content
+        encode_varint(nid, out)
+        encode_varint(version, out)
+        encode_u32(digest, out)
+        encode_bytes_list(raw_interests, out)
+
+    def decode_beacon(self, data, i):
+        nid, i = decode_varint(data, i)
+        version, i = decode_varint(data, i)
+        digest, i = decode_u32(data, i)
+        raw_interests, i = decode_bytes_list(data, i)
+        return (nid, version, digest, raw_interests), i
+
+    def encode_digest(self, content, out):
+        nid, version, digest = content
+        encode_varint(nid, out)
+        encode_varint(version, out)
+        encode_u32(digest, out)
+
+    def decode_digest(self, data, i):
+        nid, i = decode_varint(data, i)
+        version, i = decode_varint(data, i)
+        digest, i = decode_u32(data, i)
+        return (nid, version, digest), i
+
+    def encode_delta(self, content, out):
+        nid, version, digest, base, added, removed = content
+        encode_varint(nid, out)
+        encode_varint(version, out)
+        encode_u32(digest, out)
+        encode_varint(base, out)
+        encode_bytes_list(added, out)
+        encode_bytes_list(removed, out)
+
+    def decode_delta(self, data, i):
+        nid, i = decode_varint(data, i)
+        version, i = decode_varint(data, i)
+        digest, i = decode_u32(data, i)
+        base, i = decode_varint(data, i)
+        added, i = decode_bytes_list(data, i)
+        removed, i = decode_bytes_list(data, i)
+        return (nid, version, digest, base, added, removed), i
+
+    def encode_fragment(self, content, out):
+        (nid, seq), index, count, chunk = content
+        encode_varint(nid, out)
+        encode_varint(seq, out)
+        encode_varint(index, out)
+        encode_varint(count, out)
+        encode_bytes(chunk, out)
+
+    def decode_fragment(self, data, i):
+        nid, i = decode_varint(data, i)
+        seq, i = decode_varint(data, i)
+        index, i = decode_varint(data, i)
+        count, i = decode_varint(data, i)
+        chunk, i = decode_bytes(data, i)
+        return ((nid, seq), index, count, chunk), i
+
+
+codecs = {"pickle": PickleCodec, "binary": BinaryCodec}
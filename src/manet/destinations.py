@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+# odd multipliers of the bloom filter's hash functions
+multipliers = np.array([
+        0x9e3779b97f4a7c15, 0xc2b2ae3d27d4eb4f, 0x165667b19e3779f9,
+        0xd6e8feb86659fd93, 0xff51afd7ed558ccd, 0xc4ceb9fe1a85ec53],
+        dtype=np.uint64)
+
+
+class Bloom:
+    """ bloom filter of node ids, bits is a multiple of 8 """
+    def __init__(self, bits=512, k=3, data=None):
+        if not 0 < k <= len(multipliers):
+            raise ValueError(f"unsupported number of hashes: {k}")
+        self.k = k
+        self.bits = bits
+        self.data = (
+                np.zeros(bits//8, dtype=np.uint8) if data is None
+                else np.frombuffer(data, dtype=np.uint8).copy())
+
+    def __positions(self, nids):
+        nids = np.asarray(nids, dtype=np.uint64).reshape(-1, 1)
+        with np.errstate(over="ignore"):
+            h = nids*multipliers[:self.k]
+        return (h >> np.uint64(32)) % np.uint64(self.bits)
+
+    def add(self, nids):
+        pos = self.__positions(nids).ravel()
+        np.bitwise_or.at(
+                self.data, (pos >> np.uint64(3)).astype(np.intp),
+                (1 << (pos & np.uint64(7))).astype(np.uint8))
+
+    def contains(self, nids):
+        pos = self.__positions(nids)
+        bits = self.data[(pos >> np.uint64(3)).astype(np.intp)]
+        bits >>= (pos & np.uint64(7)).astype(np.uint8)
+        return (bits & 1).all(axis=1)
+
+    def copy(self):
+        return Bloom(self.bits, self.k, self.data.tobytes())
+
+
+class Destinations:
+    """
+    Destination list of a message as sorted arrays of node ids and hints,
+    merged with matched neighbors in a few vectorized steps. With a bloom
+    filter, nodes reached (hint 0) are kept in the filter instead of the
+    arrays; with max_size only that many entries with the lowest hints are
+    kept. Dropping entries can only cause extra forwarding, a bloom false
+    positive can suppress a forward.
+    """
+    def __init__(self, ids=None, hints=None, *, bloom=None, max_size=None):
+        self.ids = np.empty(0, dtype=np.int64) if ids is None else ids
+        self.hints = np.empty(0, dtype=np.uint8) if hints is None else hints
+        self.bloom = bloom
+        self.max_size = max_size
+
+    @classmethod
+    def from_dict(cls, destinations, **kwargs):
+        n = len(destinations)
+        ids = np.fromiter(destinations, dtype=np.int64, count=n)
+        hints = np.fromiter(destinations.values(), dtype=np.uint8, count=n)
+        order = np.argsort(ids)
+        return cls(ids[order], hints[order], **kwargs).compact()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __eq__(self, other):
+        return (
+                isinstance(other, Destinations)
+                and np.array_equal(self.ids, other.ids)
+                and np.array_equal(self.hints, other.hints)
+                and (self.bloom is None) == (other.bloom is None)
+                and (self.bloom is None
+                    or np.array_equal(self.bloom.data, other.bloom.data)))
+
+    def items(self):
+        return zip(self.ids.tolist(), self.hints.tolist())
+
+    def values(self):
+        # hints, including the 0 of every node in the bloom filter
+        if self.bloom is not None and self.bloom.data.any():
+            return np.append(self.hints, 0)
+        return self.hints
+
+    def compact(self):
+        # moves reached nodes into the bloom filter and applies max_size
+        if self.bloom is not None:
+            reached = self.hints == 0
+            if reached.any():
+                self.bloom.add(self.ids[reached])
+                self.ids = self.ids[~reached]
+                self.hints = self.hints[~reached]
+        if self.max_size is not None and len(self.ids) > self.max_size:
+            keep = np.sort(
+                    np.argsort(self.hints, kind="stable")[:self.max_size])
+            self.ids = self.ids[keep]
+            self.hints = self.hints[keep]
+        return self
+
+    def merge(self, nids, hints):
+        """
+        Lowers the hint of every nid to hints where that is lower than
+        carried, adding nids that are missing. Returns the merged
+        destinations and the lowest hint that was applied (None if nothing
+        changed); self is left untouched.
+        """
+        nids = np.asarray(nids, dtype=np.int64)
+        hints = np.asarray(hints, dtype=np.uint8)
+        if len(nids) == 0:
+            return self, None
+        pos = np.searchsorted(self.ids, nids)
+        found = pos < len(self.ids)
+        found[found] = self.ids[pos[found]] == nids[found]
+        carried = np.full(len(nids), 256, dtype=np.int16)
+        carried[found] = self.hints[pos[found]]
+        if self.bloom is not None:
+            carried[self.bloom.contains(nids)] = 0
+        improved = hints < carried
+        if not improved.any():
+            return self, None
+        ids = self.ids
+        new_hints = self.hints.copy()
+        update = improved & found
+        new_hints[pos[update]] = hints[update]
+        insert = improved & ~found
+        if insert.any(): # append and restore order, cheaper than np.insert
+            ids = np.concatenate((ids, nids[insert]))
+            new_hints = np.concatenate((new_hints, hints[insert]))
+            order = np.argsort(ids, kind="stable")
+            ids = ids[order]
+            new_hints = new_hints[order]
+        merged = Destinations(
+                ids, new_hints,
+                bloom=None if self.bloom is None else self.bloom.copy(),
+                max_size=self.max_size)
+        return merged.compact(), int(hints[improved].min())
@@ -2,27 +2,35 @@
 # -*- coding: utf-8 -*-
 
 import matplotlib.pyplot as plt
-import numpy as np
-import pickle
 
-
-
-def get_pickles(): 
-    files = {
-            "gossip 0.1": "./pickles/gossip_0_1_seed_47.pickle",
-            "gossip 0.3": "./pickles/gossip_0_3_seed_47.pickle",
-            "gossip 0.5": "./pickles/gossip_0_5_seed_47.pickle",
-            "gossip 0.7": "./pickles/gossip_0_7_seed_47.pickle",
-            "gossip 0.9": "./pickles/gossip_0_9_seed_47.pickle",
-            "hint 0": "./pickles/hint_0_seed_47.pickle",
-            "hint 1": "./pickles/hint_1_seed_47.pickle",
-            "hint 2": "./pickles/hint_2_seed_47.pickle"
-        }
-    results = {}
-    for title, fname in files.items():
-        with open(fname, "rb") as f:
-            results[title] = pickle.load(f)
-    return results
+from manet.registry import TrialRegistry, newest
+from manet.results import convert_pickles
+
+
+# trials compared by the plots
+titles = (
+        "gossip 0.1", "gossip 0.3", "gossip 0.5", "gossip 0.7", "gossip 0.9",
+        "hint 0", "hint 1", "hint 2")
+
+def get_trials(seed=47, num_nodes=100, radio_range=75, medium=None):
+    """
+    Trials of the plotted titles in results/ (pickles are converted on
+    first use) for one scenario. A title with several result directories,
+    e.g. converted pickles, a benchmark and a sweep of hint 2, is plotted
+    from the newest of them.
+    """
+    convert_pickles()
+    registry = TrialRegistry()
+    trials = newest(
+            t for t in registry.select(
+                seed=seed, num_nodes=num_nodes, radio_range=radio_range,
+                medium=medium)
+            if t.title in titles)
+    return registry, trials
+
+def get_results():
+    registry, trials = get_trials()
+    return {t.title: t.results for t in trials}
 
 """
 WHATS INSIDE EACH PICKLE FILE?
@@ -39,180 +47,140 @@ trial-name:
     paths
 """
 
+metrics = None # metric table of get_trials(), shared by the plots
+mediums = None # title: medium that produced it
+
+def get_metrics():
+    # every metric of every trial, computed once and cached on disk
+    global metrics, mediums
+    if metrics is None:
+        registry, trials = get_trials()
+        metrics = registry.table(trials)
+        mediums = {t.title: t.medium for t in trials}
+    return metrics
+
+def plot_metric(metric, *, exclude=(), **kwargs):
+    values = dict(get_metrics()[metric])
+    for title in exclude: # remove participants
+        values.pop(title, None)
+    plot_results(values, mediums=mediums, **kwargs)
+
 def plot_recv_max():
-    trials = get_pickles()
-    cost = {}
-    for title, data in trials.items():
-        msgs_rcvd = []
-        for topic_rcvd in data["sub"].values():
-            # go through each topic get latency of each message
-            node_msgs_rcvd = 0
-            for rlist in topic_rcvd.values():
-                node_msgs_rcvd += len(rlist)
-            msgs_rcvd.append(node_msgs_rcvd)
-        cost[title] = max(msgs_rcvd)
-    # remove participants
-    del cost["gossip 0.1"]
-    del cost["gossip 0.3"]
-    plot_results(
-            cost, 
+    plot_metric(
+            "recv_max",
+            exclude=("gossip 0.1", "gossip 0.3"),
             title="Routing Protocol Max Subscription Receives", 
             xlabel="Protocols", 
             ylabel="Number of Events Received")
 
 def plot_recv_min():
-    trials = get_pickles()
-    cost = {}
-    for title, data in trials.items():
-        msgs_rcvd = []
-        for topic_rcvd in data["sub"].values():
-            # go through each topic get latency of each message
-            node_msgs_rcvd = 0
-            for rlist in topic_rcvd.values():
-                node_msgs_rcvd += len(rlist)
-            msgs_rcvd.append(node_msgs_rcvd)
-        cost[title] = min(msgs_rcvd)
-    # remove participants
-    del cost["gossip 0.1"]
-    del cost["gossip 0.3"]
-    plot_results(
-            cost, 
+    plot_metric(
+            "recv_min",
+            exclude=("gossip 0.1", "gossip 0.3"),
             title="Routing Protocol Max Subscription Receives", 
             xlabel="Protocols", 
             ylabel="Number of Events Received")
 
 def plot_recv_fairness():
-    trials = get_pickles()
-    cost = {}
-    for title, data in trials.items():
-        msgs_rcvd = []
-        for topic_rcvd in data["sub"].values():
-            # go through each topic get latency of each message
-            node_msgs_rcvd = 0
-            for rlist in topic_rcvd.values():
-                node_msgs_rcvd += len(rlist)
-            msgs_rcvd.append(node_msgs_rcvd)
-        cost[title] = max(msgs_rcvd) - min(msgs_rcvd)
-    # remove participants
-    del cost["gossip 0.1"]
-    del cost["gossip 0.3"]
-    plot_results(
-            cost, 
+    plot_metric(
+            "recv_fairness",
+            exclude=("gossip 0.1", "gossip 0.3"),
             title="Routing Protocol Max-Min Receives Difference", 
             xlabel="Protocols", 
             ylabel="Number of Events Received")
 
 
 def plot_cost_min():
-    trials = get_pickles()
-    cost = {}
-    for title, data in trials.items():
-        num_sends = []
-        for nid, send_log in data["send"].items():
-            num_sends.append(len(send_log))
-        cost[title] = min(num_sends)
-    del cost["gossip 0.1"]
-    del cost["gossip 0.3"]
-    plot_results(
-            cost, 
+    plot_metric(
+            "cost_min",
+            exclude=("gossip 0.1", "gossip 0.3"),
             title="Routing Protocol Min Cost", 
             xlabel="Protocols", 
             ylabel="'Send' Operations")
 def plot_cost_max():
-    trials = get_pickles()
-    cost = {}
-    for title, data in trials.items():
-        num_sends = []
-        for nid, send_log in data["send"].items():
-            num_sends.append(len(send_log))
-        cost[title] = max(num_sends)
-    del cost["gossip 0.1"]
-    del cost["gossip 0.3"]
-    plot_results(
-            cost, 
+    plot_metric(
+            "cost_max",
+            exclude=("gossip 0.1", "gossip 0.3"),
             title="Routing Protocol Max Cost", 
             xlabel="Protocols", 
             ylabel="'Send' Operations")
 def plot_cost_fairness():
-    trials = get_pickles()
-    cost = {}
-    for title, data in trials.items():
-        num_sends = []
-        for nid, send_log in data["send"].items():
-            num_sends.append(len(send_log))
-        cost[title] = max(num_sends) - min(num_sends)
-    del cost["gossip 0.1"]
-    del cost["gossip 0.3"]
-    plot_results(
-            cost, 
+    plot_metric(
+            "cost_fairness",
+            exclude=("gossip 0.1", "gossip 0.3"),
             title="Routing Protocol Max-Min Cost Difference", 
             xlabel="Protocols", 
             ylabel="'Send' Operations")
 
 
 def plot_cost():
-    trials = get_pickles()
-    cost = {}
-    for title, data in trials.items():
-        num_sends = 0
-        for nid, send_log in data["send"].items():
-            num_sends += len(send_log)
-        assert len(data["send"]) == 100
-        cost[title] = num_sends/len(data["send"])
-    plot_results(
-            cost, 
+    plot_metric(
+            "cost",
             title="Routing Protocol Average Cost per Node", 
             xlabel="Protocols", 
             ylabel="'Send' Operations")
 
 
-
+def plot_bytes_per_delivery():
+    plot_metric(
+            "bytes_per_delivery",
+            title="Routing Protocol Bytes Sent per Delivered Event",
+            xlabel="Protocols",
+            ylabel="Bytes")
 
 
 def plot_reliability():
-    trials = get_pickles()
-    reliability = {}
-    for title, data in trials.items():
-        num_pubs = 0
-        for plist in data["pub"].values():
-            num_pubs += len(plist)
-        #assert num_pubs == 120
-        num_successes = 0
-        for topic_rcvd in data["sub"].values():
-            num_successes += sum([len(r) for r in topic_rcvd.values()])
-        #assert len(data["sub"]) == 10
-        average_num_successes = num_successes/len(data["sub"])
-        reliability[title] = average_num_successes/num_pubs
-
-    plot_results(
-            reliability, 
+    plot_metric(
+            "reliability",
             title="Routing Protocol Average Reliability per Subscriber", 
             xlabel="Protocols", 
             ylabel="Reliability")
 
 
+def average_latency(data):
+    total_latency = 0
+    num_msgs = 0
+    for topic_rcvd in data["sub"].values():
+        # go through each topic get latency of each message
+        for rlist in topic_rcvd.values():
+            total_latency += sum([r[0] - r[1][1] for r in rlist])
+            num_msgs += len(rlist)
+    return total_latency/num_msgs
+
 def plot_latency():
-    trials = get_pickles()
-    latency = {}
-    for title, data in trials.items():
-        total_latency = 0
-        num_msgs = 0
-        for topic_rcvd in data["sub"].values():
-            # go through each topic get latency of each message
-            for rlist in topic_rcvd.values():
-                total_latency += sum([r[0] - r[1][1] for r in rlist])
-                num_msgs += len(rlist)
-        latency[title] = total_latency/num_msgs
-    plot_results(
-            latency,
+    plot_metric(
+            "latency",
             title="Routing Protocol Average Latency per Subscriber",
             xlabel="Protocols",
             ylabel="Latency (seconds)")
 
+def plot_latency_p90():
+    plot_metric(
+            "latency_p90",
+            title="Routing Protocol 90th Percentile Latency",
+            xlabel="Protocols",
+            ylabel="Latency (seconds)")
+
+def plot_all():
+    for plot in (
+            plot_reliability, plot_latency, plot_latency_p90, plot_cost,
+            plot_cost_min, plot_cost_max, plot_cost_fairness,
+            plot_recv_min, plot_recv_max, plot_recv_fairness,
+            plot_bytes_per_delivery):
+        plot()
+
 
 
 
-def plot_results(results, xlabel=None, ylabel=None, title=None):
+def plot_results(results, xlabel=None, ylabel=None, title=None, mediums=None):
+    # mediums (title: "des" or "realtime") label every bar with the medium
+    # that produced it, results of different media are not comparable
+    if mediums:
+        used = sorted({mediums[t] for t in results})
+        note = ", ".join(used)
+        if len(used) > 1:
+            note += ", not comparable"
+        title = f"{title} ({note})"
     results = [(v, k) for k, v in results.items()]
     results.sort()
     styles = {
@@ -241,6 +209,8 @@ def plot_results(results, xlabel=None, ylabel=None, title=None):
                 (t, 
                 plt.bar(i, v, bar_width, 
                     alpha=alpha, color=color, label=t)))
+    if mediums:
+        handles = [(f"{t} [{mediums[t]}]", bar) for t, bar in handles]
     handles.sort()
     labels = [h[0] for h in handles]
     rects = [h[1] for h in handles]
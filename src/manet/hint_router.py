@@ -2,65 +2,356 @@
 # -*- coding: utf-8 -*-
 
 import math
-import pickle
-from threading import Lock, Thread
+import time
+import zlib
+from threading import Thread
 
 
 from hmap.interface.routing import Router
 
+from manet.cache import InterestCache
+from manet.codec import BinaryCodec
+from manet.destinations import Bloom, Destinations
+from manet.packer import FramePacker, Reassembler
+from manet.scheduler import Scheduler
+from manet.stale import StaleCache
+from manet.stats import Stats, TimedLock
+
+
+def interest_digest(raw_interests):
+    # order independent, stable across processes unlike hash()
+    digest = 0
+    for ri in sorted(raw_interests):
+        digest = zlib.crc32(ri, zlib.crc32(len(ri).to_bytes(4, "big"), digest))
+    return digest
+
 class HintRouter(Router):
     def __init__(self, *, 
-            matcher, context, transceiver, beacon_interval=2, credit=1
+            matcher, context, transceiver, beacon_interval=2, credit=1,
+            stale_ttl=30, max_stale=2**16, codec=None, interest_cache=None,
+            publish_window=0, mtu=None, indexed_destinations=False,
+            max_destinations=None, bloom_bits=0, adaptive_beacon=False,
+            min_beacon_interval=1, max_beacon_interval=10, beacon_speed=10,
+            suppress_beacons=True, piggyback_window=0, max_digests=3,
+            incarnation=0
             ): 
         super().__init__(matcher=matcher)
         # communication and context
         self.__max_hint = 10
         self.__ctx = context
-        self.__trx_lock = Lock()
+        # counters and timers, see stats.py
+        self.__stats = Stats(counters=(
+                "beacons_in", "beacons_out", "messages_received",
+                "messages_delivered", "messages_stale", "messages_cancelled",
+                "forwarded_by_hint", "forwarded_by_credit",
+                "frames_malformed", "neighbors_evicted"))
+        self.__counts = self.__stats.counters
+        self.__encode_timer = self.__stats.timer("encode")
+        self.__decode_timer = self.__stats.timer("decode")
+        self.__queue_depth = self.__stats.histogram("queue_depth")
+        self.__trx_lock = TimedLock(self.__stats.timer("trx_lock_wait"))
         self.__trx = transceiver
+        # frame encoding, PickleCodec is kept for compatibility
+        self.__codec = BinaryCodec() if codec is None else codec
 
-        self.__stale = set()
+        # message ids seen within the last stale_ttl seconds
+        self.__stale = StaleCache(ttl=stale_ttl, max_size=max_stale)
 
+        # a router replacing an earlier one of the same node (e.g. one that
+        # migrated to another process) numbers its messages, fragments and
+        # interest versions from incarnation << 32 on, so neighbors never
+        # take them for the earlier router's (stale, or known interests)
+        first = incarnation << 32
         self.__credit = credit
         self.__dt = beacon_interval
         self.__nid = context.uid # node id
         # interest: uid map
-        self.__nbrs_lock = Lock()
+        self.__nbrs_lock = TimedLock(self.__stats.timer("nbrs_lock_wait"))
         self.__nbrs = self.Interest.Map()
-        # raw_subscriptions and last beacon of neighbors
+        # raw interest: interest, may be shared with other routers
+        self.__interests = (
+                InterestCache() if interest_cache is None else interest_cache)
+        # raw_subscriptions and beacon epoch neighbor was last heard in,
+        # hint of a neighbor is the number of epochs since then; with
+        # adaptive beacons an epoch is beacon_interval seconds of time
+        # instead, this router's own interval varies and would age hints
+        # at a different pace than neighbors beacon
+        self.__epoch = (
+                int(context.time//beacon_interval) if adaptive_beacon else 0)
         self.__hint_table = {}
+        # epoch: set of nids last heard in that epoch (expiry index)
+        self.__heard = {}
+        # local interests as of last beacon, version bumps on every change
+        self.__raw_interests = frozenset()
+        self.__version = first
+        self.__digest = interest_digest(self.__raw_interests)
 
         # unique-token: msg (should not by bytes)
-        self.__scheduled = {}
+        self.__scheduled = Scheduler()
         # uid, timestamp
-        self.__msg_timestamp = 0
+        self.__msg_timestamp = first
+        # events published within publish_window seconds of the first one
+        # are matched and sent together, frames are kept within mtu bytes
+        self.__publish_window = publish_window
+        self.__published = []
+        self.__publish_time = math.inf
+        self.__packer = (
+                None if mtu is None 
+                else FramePacker(self.__codec, mtu, self.__nid, seq=first))
+        self.__reassembler = Reassembler()
+        # destination lists as sorted arrays (Destinations) instead of dicts,
+        # optionally capped and with reached nodes kept in a bloom filter
+        self.__indexed = indexed_destinations
+        self.__max_destinations = max_destinations
+        self.__bloom_bits = bloom_bits
+        # topic: [matching neighbor ids, epochs they were heard in, epoch
+        # of hints, hints], dropped when a neighbor's interests change or it
+        # is heard in a new epoch (nid: topics cached with it)
+        self.__matches = {}
+        self.__matched_topics = {}
+        self.__match_hits = 0
+        self.__match_misses = 0
 
-        self.__recv_loop_thread = Thread(target=self.recv_loop)
-        self.__recv_loop_thread.start()
+        self.__next_beacon_time = context.time
+        # adaptive beaconing: the interval shrinks from max towards min
+        # with speed (halved at beacon_speed m/s) and neighbor churn, and
+        # unchanged beacons are skipped until max_beacon_interval passes
+        self.__adaptive = adaptive_beacon
+        self.__min_dt = min_beacon_interval
+        self.__max_dt = max_beacon_interval
+        self.__beacon_speed = beacon_speed
+        self.__suppress = adaptive_beacon and suppress_beacons
+        self.__churn = 0 # neighbors gained or lost since last beacon epoch
+        self.__last_beacon_time = -math.inf
+        self.__beacons_suppressed = 0
+        # a beacon due within piggyback_window seconds is sent early with
+        # outgoing data, as a digest for at most max_digests in a row
+        self.__piggyback_window = piggyback_window
+        self.__max_digests = max_digests
+        self.__digests = 0
+        self.__piggybacked = False # beacon of coming epoch already sent
+        self.__beacons_piggybacked = 0
+        self.__beacons_digested = 0
+
+        self.start()
 
     def on_beacon(self, contents):
-        # extract beacon information
-        nid, raw_interests = contents
+        # extract beacon information, full interest set of neighbor
+        nid, version, digest, raw_interests = contents
         try:
-            old_raw_interests, hint = self.__hint_table[nid]
+            old_raw_interests, old_version, old_digest, heard = (
+                    self.__hint_table[nid])
         except KeyError:
             # not found need to add
+            raw_interests = frozenset(raw_interests)
             for ri in raw_interests:
-                i = self.Interest.deserialize(ri)
+                i = self.__interests.deserialize(self.Interest, ri)
                 self.__nbrs.add(i, nid)
+            if raw_interests:
+                self.__clear_matches()
+            self.__churn += 1
         else:
             # see if need to update interests
-            if old_raw_interests != raw_interests: # need to update
-                # remove old interests from __nbrs
-                for ri in old_raw_interests:
-                    i = self.Interest.deserialize(ri)
-                    self.__nbrs.remove(i, nid)
-                # add new interests to __nbrs
-                for ri in raw_interests:
-                    i = self.Interest.deserialize(ri)
-                    self.__nbrs.add(i, nid)
+            if (version, digest) != (old_version, old_digest):
+                raw_interests = frozenset(raw_interests)
+                self.__update_interests(
+                        nid, 
+                        raw_interests - old_raw_interests, 
+                        old_raw_interests - raw_interests)
+            else: # unchanged, nothing to deserialize
+                raw_interests = old_raw_interests
+        self.__heard_from(nid, raw_interests, version, digest)
+
+    def on_digest(self, contents):
+        # piggybacked beacon, only refreshes neighbors known to be unchanged
+        nid, version, digest = contents
+        try:
+            raw_interests, old_version, old_digest, heard = (
+                    self.__hint_table[nid])
+        except KeyError:
+            # unknown interests, wait for next full beacon
+            return
+        if (version, digest) == (old_version, old_digest):
+            self.__heard_from(nid, raw_interests, version, digest)
+
+    def on_delta(self, contents):
+        # extract beacon information, changes since version base
+        nid, version, digest, base, added, removed = contents
+        try:
+            old_raw_interests, old_version, old_digest, heard = (
+                    self.__hint_table[nid])
+        except KeyError:
+            # nothing to apply delta to, wait for next full beacon
+            return
+        if (version, digest) == (old_version, old_digest): # already applied
+            raw_interests = old_raw_interests
+        elif old_version == base:
+            added = frozenset(added)
+            removed = frozenset(removed)
+            self.__update_interests(nid, added, removed)
+            raw_interests = (old_raw_interests - removed) | added
+        else:
+            # missed an update, keep old interests until next full beacon
+            raw_interests, version, digest = (
+                    old_raw_interests, old_version, old_digest)
+        self.__heard_from(nid, raw_interests, version, digest)
+
+    def __update_interests(self, nid, added, removed):
+        if added or removed:
+            self.__clear_matches()
+        # remove old interests from __nbrs
+        for ri in removed:
+            i = self.__interests.deserialize(self.Interest, ri)
+            self.__nbrs.remove(i, nid)
+        # add new interests to __nbrs
+        for ri in added:
+            i = self.__interests.deserialize(self.Interest, ri)
+            self.__nbrs.add(i, nid)
+
+    def __heard_from(self, nid, raw_interests, version, digest):
+        try:
+            heard = self.__hint_table[nid][3]
+        except KeyError:
+            pass
+        else:
+            self.__heard[heard].discard(nid)
+            if heard != self.__epoch: # hint drops to 0
+                self.__drop_matches(nid)
         # reset hint table
-        self.__hint_table[nid] = (raw_interests, 0) 
+        self.__hint_table[nid] = (raw_interests, version, digest, self.__epoch)
+        try:
+            self.__heard[self.__epoch].add(nid)
+        except KeyError:
+            self.__heard[self.__epoch] = {nid}
+
+    def __clear_matches(self):
+        self.__matches.clear()
+        self.__matched_topics.clear()
+
+    def __drop_matches(self, nid):
+        for topic in self.__matched_topics.pop(nid, ()):
+            self.__matches.pop(topic, None)
+
+    def __match(self, event):
+        # matching neighbors and their hints, one dict hit for a cached topic
+        # (hints are recomputed once per epoch as they all age together)
+        topic = getattr(event, "topic", None)
+        try:
+            match = self.__matches[topic]
+        except KeyError:
+            pass
+        else:
+            self.__match_hits += 1
+            nids, heard, epoch, hints = match
+            if epoch != self.__epoch:
+                epoch = match[2] = self.__epoch
+                hints = match[3] = tuple(epoch - h for h in heard)
+            return nids, hints
+        nids = tuple(self.__nbrs.match(event))
+        heard = tuple(self.__hint_table[nid][3] for nid in nids)
+        hints = tuple(self.__epoch - h for h in heard)
+        if topic is not None: # matchers without topics are not cached
+            self.__match_misses += 1
+            self.__matches[topic] = [nids, heard, self.__epoch, hints]
+            for nid in nids:
+                try:
+                    self.__matched_topics[nid].add(topic)
+                except KeyError:
+                    self.__matched_topics[nid] = {topic}
+        return nids, hints
+
+    def __age_hints(self):
+        # a new beacon epoch ages every hint by one, neighbors whose hint
+        # goes past max_hint are evicted
+        self.__epoch += 1
+        expired = self.__heard.pop(self.__epoch - self.__max_hint - 1, ())
+        for nid in expired:
+            self.__churn += 1
+            self.__counts["neighbors_evicted"] += 1
+            self.__drop_matches(nid)
+            raw_interests, version, digest, heard = self.__hint_table.pop(nid)
+            for ri in raw_interests:
+                i = self.__interests.deserialize(self.Interest, ri)
+                self.__nbrs.remove(i, nid)
+
+    def __age_to(self, epoch):
+        while self.__epoch < epoch:
+            self.__age_hints()
+
+    def __beacon_interval(self):
+        if not self.__adaptive:
+            return self.__dt
+        speed = math.hypot(self.__ctx.x_vel, self.__ctx.y_vel)
+        churn = self.__churn/max(1, len(self.__hint_table))
+        dt = self.__max_dt/((1 + speed/self.__beacon_speed)*(1 + churn))
+        return min(max(dt, self.__min_dt), self.__max_dt)
+
+    def __beacon(self):
+        # full beacon unless local interests just changed by less than
+        # they hold, receivers skip full beacons whose digest they know
+        raw_interests = frozenset(
+                self.Interest.serialize(i) for i in self.local_interests)
+        old_raw_interests = self.__raw_interests
+        if raw_interests == old_raw_interests:
+            if len(raw_interests) == 0: # nothing worth beaconing
+                return None
+            content = (
+                    self.__nid, self.__version, self.__digest, 
+                    tuple(raw_interests))
+            return ("beacon", content)
+        base = self.__version
+        self.__raw_interests = raw_interests
+        self.__version += 1
+        self.__digest = interest_digest(raw_interests)
+        added = tuple(raw_interests - old_raw_interests)
+        removed = tuple(old_raw_interests - raw_interests)
+        if base > 0 and len(added) + len(removed) < len(raw_interests):
+            content = (
+                    self.__nid, self.__version, self.__digest, base, 
+                    added, removed)
+            return ("delta", content)
+        content = (
+                self.__nid, self.__version, self.__digest, 
+                tuple(raw_interests))
+        return ("beacon", content)
+
+    def __beacon_message(self, *, piggyback=False, early=False):
+        # beacon to send (None if there is nothing worth sending), early
+        # when one already went out with data before the epoch began,
+        # piggybacked beacons neighbors already know shrink to a digest
+        version = self.__version
+        msg = self.__beacon()
+        if msg is None:
+            return None
+        changed = version != self.__version
+        if early and not changed: # neighbors heard it moments ago
+            return None
+        unchanged = not changed and self.__churn == 0
+        if self.__suppress and unchanged and (
+                self.__ctx.time - self.__last_beacon_time < self.__max_dt):
+            # neighbors already know everything it would tell
+            self.__beacons_suppressed += 1
+            return None
+        if piggyback and unchanged and self.__digests < self.__max_digests:
+            # full beacon at least every max_digests + 1 for new neighbors
+            msg = ("digest", msg[1][:3])
+            self.__digests += 1
+            self.__beacons_digested += 1
+        elif msg[0] == "beacon":
+            self.__digests = 0
+        if piggyback:
+            self.__beacons_piggybacked += 1
+        self.__last_beacon_time = self.__ctx.time
+        self.__counts["beacons_out"] += 1
+        return msg
+
+    def __beacon_bytes(self):
+        if self.__packer is None:
+            return None
+        channel_bytes = self.__packer.stats["channel_bytes"]
+        return sum(
+                channel_bytes.get(channel, 0)
+                for channel in ("beacon", "delta", "digest"))
 
     def on_message(self, contents):
         current_time = self.__ctx.time
@@ -69,12 +360,16 @@ class HintRouter(Router):
         # dstinations, dictionary of id: hint
         # raw_event: serialized event
         mid, destinations, credit, raw_event = contents
+        counts = self.__counts
+        counts["messages_received"] += 1
         if mid in self.__stale: # message has been received before
             # "removed from list of messages scheduled for transmission
             # and dropped"
             # - see if message is schedule, if so drop it 
+            counts["messages_stale"] += 1
             if mid in self.__scheduled:
-                del self.__scheduled[mid]
+                counts["messages_cancelled"] += 1
+            self.__scheduled.cancel(mid)
             return # "message received, dropped without further processing"
         else: # message was never received before
             forward_delay = math.inf # whether or not to forward message
@@ -83,134 +378,236 @@ class HintRouter(Router):
             # matches some predicate into its subscription table
             num_matches = self.notify_subscriptions(event)
             assert type(num_matches) is int #TODO return num matches
+            if num_matches > 0:
+                counts["messages_delivered"] += 1
             # checks if event matches some subscription, if so change
             # hint of self in destination to 0
-            if num_matches > 0:
-                destinations[self.__nid] = 0
-                forward_delay = 0
-            # furtherly broker determines if it has to reforward message
-            # broker neighbors are new or not in destination
-            nbrs = self.__nbrs.match(event) # find all matching neighbors
-            for nid in nbrs:
-                interests, last = self.__hint_table[nid]
-                if last > self.__max_hint: # ignore nbrs that you haven't hear from in a while
-                    continue
-                try:
-                    # (2) hint for nid is less than one in message
-                    if destinations[nid] > last:
+            if self.__indexed:
+                destinations, forward_delay = self.__merge_destinations(
+                        destinations, event, num_matches)
+            else:
+                if isinstance(destinations, Destinations):
+                    destinations = dict(destinations.items())
+                if num_matches > 0:
+                    destinations[self.__nid] = 0
+                    forward_delay = 0
+                # furtherly broker determines if it has to reforward message
+                # broker neighbors are new or not in destination
+                nbrs, hints = self.__match(event) # all matching neighbors
+                for nid, last in zip(nbrs, hints):
+                    try:
+                        # (2) hint for nid is less than one in message
+                        if destinations[nid] > last:
+                            destinations[nid] = last
+                            forward_delay = min(forward_delay, 0.1*last)
+                    except KeyError: # (1) nid doesn't belong to destinations
                         destinations[nid] = last
                         forward_delay = min(forward_delay, 0.1*last)
-                except KeyError: # (1) nid doesn't belong to destinations
-                    destinations[nid] = last
-                    forward_delay = min(forward_delay, 0.1*last)
         if forward_delay == math.inf: # use credits instead
             # NO NEW CHANGES WERE APPLIED
             if credit > 0: # credit to send message off anyways
                 credit -= 1 # decrement 
                 content = (mid, destinations, credit, raw_event)
                 msg = ("message", content)
-                self.__scheduled[mid] = (current_time + 0.1*self.__max_hint, msg)
+                self.__scheduled.schedule(
+                        mid, current_time + 0.1*self.__max_hint, msg)
+                counts["forwarded_by_credit"] += 1
         else: # forward delay changed, good to send
+            counts["forwarded_by_hint"] += 1
             content = (mid, destinations, credit, raw_event)
             msg = ("message", content)
-            self.__scheduled[mid] = (
-                    current_time + forward_delay, msg)
-        self.__stale.add(mid)
+            self.__scheduled.schedule(mid, current_time + forward_delay, msg)
+        self.__stale.add(mid, current_time)
+
+    def __destinations(self, destinations):
+        # destinations as configured for this router
+        if not isinstance(destinations, Destinations):
+            destinations = Destinations.from_dict(destinations)
+        if destinations.bloom is None and self.__bloom_bits:
+            destinations.bloom = Bloom(self.__bloom_bits)
+        destinations.max_size = self.__max_destinations
+        return destinations.compact()
+
+    def __merge_destinations(self, destinations, event, num_matches):
+        # same rules as the dict merge in on_message, in one vectorized step
+        nids, hints = self.__match(event)
+        if num_matches > 0:
+            nids += (self.__nid,)
+            hints += (0,)
+        destinations, lowest = self.__destinations(destinations).merge(
+                nids, hints)
+        if num_matches > 0:
+            return destinations, 0
+        if lowest is None:
+            return destinations, math.inf
+        return destinations, 0.1*lowest
 
     def notify_router(self, event):
+        self.notify_router_batch((event,))
+
+    def notify_router_batch(self, events):
+        # events wait for the rest of the publish window, then go out in
+        # as few frames as mtu allows
         with self.__nbrs_lock:
-            destinations = {}
-            nbrs = self.__nbrs.match(event)
-            for nid in nbrs:
-                interests, last = self.__hint_table[nid]
-                if last > self.__max_hint: # ignore
-                    continue
-                destinations[nid] = last
+            if not self.__published:
+                self.__publish_time = self.__ctx.time + self.__publish_window
+            self.__published.extend(events)
+        self.wake()
+
+    def __publish(self, now):
+        # neighbors are matched once per topic for the whole batch
+        for event in self.__published:
+            destinations = dict(zip(*self.__match(event)))
+            if self.__indexed:
+                destinations = self.__destinations(destinations)
             mid = (self.__nid, self.__msg_timestamp)
             raw_event = self.Event.serialize(event)
             content = (mid, destinations, self.__credit, raw_event)
             msg = ("message", content)
-            messages = [("message", content)] # messages of size 1
-            with self.__trx_lock:
-                self.__trx.send(pickle.dumps(messages))
+            # sent by this step along with anything else that is due
+            self.__scheduled.schedule(mid, now, msg)
             self.__msg_timestamp += 1
+        self.__published.clear()
+        self.__publish_time = math.inf
+
+    def __frames(self, messages):
+        start = time.perf_counter()
+        if self.__packer is None: # no mtu, everything in one frame
+            frames = [self.__codec.encode(messages)]
+        else:
+            frames = self.__packer.pack(messages)
+        self.__encode_timer.add(time.perf_counter() - start)
+        return frames
+
+    def __dispatch(self, raw_data):
+        start = time.perf_counter()
+        try:
+            messages = self.__codec.decode(raw_data)
+        except ValueError: # malformed frame, drop it
+            messages = ()
+            self.__counts["frames_malformed"] += 1
+        self.__decode_timer.add(time.perf_counter() - start)
+        for channel, content in messages:
+            if channel == "beacon":
+                self.__counts["beacons_in"] += 1
+                self.on_beacon(content) # update tables
+            elif channel == "delta":
+                self.__counts["beacons_in"] += 1
+                self.on_delta(content)
+            elif channel == "digest":
+                self.__counts["beacons_in"] += 1
+                self.on_digest(content)
+            elif channel == "message":
+                self.on_message(content)
+            elif channel == "fragment":
+                frame = self.__reassembler.add(content, self.__ctx.time)
+                if frame is not None: # last piece of a fragmented frame
+                    self.__dispatch(frame)
+
+    def wake(self):
+        # sends whatever other threads just made due from the calling
+        # thread, recv_loop may be blocked in the transceiver until its next
+        # deadline
+        frames, timeout = self.step(b"")
+        self.__send(frames)
+
+    def __send(self, frames):
+        for frame in frames:
+            with self.__trx_lock:
+                self.__trx.send(frame)
+
+    @property
+    def stats(self):
+        return {
+                "stale": self.__stale.stats,
+                "interests": self.__interests.stats,
+                "frames": (
+                    None if self.__packer is None else self.__packer.stats),
+                "fragments": self.__reassembler.stats,
+                "matches": {
+                    "size": len(self.__matches),
+                    "hits": self.__match_hits,
+                    "misses": self.__match_misses},
+                "beacons": {
+                    "suppressed": self.__beacons_suppressed,
+                    "piggybacked": self.__beacons_piggybacked,
+                    "digests": self.__beacons_digested,
+                    # as packed into frames, unknown without an mtu
+                    "bytes": self.__beacon_bytes()},
+                **self.__stats.as_dict()
+        }
+
+    def start(self):
+        # threaded driver, subclasses drive step() some other way
+        self.__recv_loop_thread = Thread(target=self.recv_loop)
+        self.__recv_loop_thread.start()
 
     def close(self):
         self.__trx.close()
         self.__recv_loop_thread.join()
 
     def recv_loop(self):
-        next_beacon_time = self.__ctx.time
         timeout = 0
         while True:
             try:
-                # wait as long as beacon interval
+                # wait until a frame or the next deadline, a publish window
+                # opened meanwhile by another thread is checked that often
                 if timeout < 0:
                     timeout = 0
+                if self.__publish_window > 0:
+                    timeout = min(timeout, self.__publish_window)
                 raw_data = self.__trx.recv(timeout=timeout)
-            except EOFError:
+            except EOFError: # transceiver closed
                 return
+            frames, timeout = self.step(raw_data)
+            self.__send(frames)
+
+    def step(self, raw_data):
+        # processes one received frame (b"" if none), returns frames that
+        # are due to be sent and the time until step should run again
+        with self.__nbrs_lock:
+            if self.__adaptive: # hints age with time
+                self.__age_to(int(self.__ctx.time//self.__dt))
             # check if next beacon time
-            with self.__nbrs_lock:
-                if next_beacon_time < self.__ctx.time: # increment hint table
-                    next_hint_table = {}
-                    for nid, v in self.__hint_table.items():
-                        raw_interest, hint = v
-                       # if hint < 10:
-                        next_hint_table[nid] = (raw_interest, hint + 1)
-                       # else: # over 10 remove from nbrs too
-                       #     for ri in raw_interests:
-                       #         i = self.Interest.deserialize(ri)
-                       #         self.__nbrs.remove(i, nid)
-                    self.__hint_table = next_hint_table
-                    # reset beacon time
-                    next_beacon_time = self.__ctx.time + self.__dt
-                    # schedule beacon message
-                    raw_interests = tuple(
-                            self.Interest.serialize(i) 
-                            for i in self.local_interests)
-                    if len(raw_interests) > 0: # has something worth beaconing
-                        content = (self.__nid, raw_interests)
-                        msg = ("beacon", content)
-                        # schedule beacon
-                        self.__scheduled[str(self.__nid)] = (
-                                self.__ctx.time, msg)
-                if len(raw_data) > 0: # received data
-                    # extract data
-                    messages = pickle.loads(raw_data) # list of messages
-                    for raw_data in messages:
-                        channel, content = raw_data
-                        if channel == "beacon":
-                            self.on_beacon(content) # update tables
-                        elif channel == "message":
-                            self.on_message(content)
-                # send off any scheduled messages
-                current_time = self.__ctx.time
-                messages = []
-                next_schedule = {}
-                timeout = next_beacon_time - current_time
-                for k, v in self.__scheduled.items():
-                    t, m = v
-                    if t <= current_time:
-                        messages.append(m)
-                    else:
-                        timeout = min(timeout, t - current_time)
-                        next_schedule[k] = (t, m)
-                self.__scheduled = next_schedule
-                messages = tuple(messages)
-                #messages = tuple(
-                #        msg 
-                #        for t, msg in self.__scheduled.values() 
-                #        if t <= current_time)
-                # send messages globbed together
-                if len(messages) > 0:
-                    with self.__trx_lock:
-                        self.__trx.send(pickle.dumps(messages))
-                # filter out old scheduled items
-                #self.__scheduled = {
-                #        k: v
-                #        for k, v in self.__scheduled.items()
-                #        if v[0] > current_time}
+            if self.__next_beacon_time < self.__ctx.time:
+                if not self.__adaptive: # increment hints
+                    self.__age_hints()
+                # reset beacon time
+                self.__next_beacon_time = (
+                        self.__ctx.time + self.__beacon_interval())
+                msg = self.__beacon_message(early=self.__piggybacked)
+                self.__piggybacked = False
+                self.__churn = 0
+                if msg is not None: # has something worth beaconing
+                    # schedule beacon
+                    self.__scheduled.schedule(
+                            str(self.__nid), self.__ctx.time, msg)
+            if len(raw_data) > 0: # received data
+                self.__dispatch(raw_data)
+            # send off any scheduled messages
+            current_time = self.__ctx.time
+            if self.__publish_time <= current_time:
+                self.__publish(current_time)
+            messages = list(self.__scheduled.pop_due(current_time))
+            if (self.__piggyback_window > 0 and not self.__piggybacked
+                    and self.__next_beacon_time - current_time 
+                    <= self.__piggyback_window
+                    and any(channel == "message" for channel, _ in messages)):
+                # beacon rides along with data instead of its own frame
+                msg = self.__beacon_message(piggyback=True)
+                if msg is not None:
+                    self.__piggybacked = True
+                    messages.append(msg)
+            timeout = min(
+                    self.__next_beacon_time, 
+                    self.__publish_time,
+                    self.__scheduled.next_deadline()) - current_time
+        # send messages globbed together
+        if len(messages) > 0:
+            # messages still waiting behind the ones sent
+            self.__queue_depth.add(len(self.__scheduled))
+            return self.__frames(messages), timeout
+        return [], timeout
         
 
 
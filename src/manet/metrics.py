@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+percentiles = (50, 90, 99)
+
+
+def per_node_counts(node_ids, column):
+    # occurrences of each of node_ids in column, zero for absent nodes
+    node_ids = np.asarray(node_ids, dtype=np.int64)
+    order = np.argsort(node_ids)
+    rows = np.searchsorted(node_ids, column, sorter=order)
+    counts = np.bincount(order[rows], minlength=len(node_ids))
+    return counts
+
+def trial_metrics(results):
+    """
+    Every metric of one trial (a results.Results), reading each column
+    once: reliability, latency mean and percentiles, per-node cost and
+    fairness, per-subscriber receives and bytes per delivery.
+    """
+    num_pubs = len(results["pub", "time"])
+    sub_nids = results["sub", "node_id"]
+    delays = results["sub", "time"] - results["sub", "send_time"]
+    sends = per_node_counts(results.node_ids, results["send", "node_id"])
+    rcvd = per_node_counts(results.subscribers, sub_nids)
+    total_bytes = int(results["send", "bytes"].sum())
+    deliveries = len(sub_nids)
+    metrics = {
+        "reliability": rcvd.mean()/num_pubs,
+        "latency": delays.mean() if deliveries else np.nan,
+        "cost": sends.mean(),
+        "cost_min": sends.min(),
+        "cost_max": sends.max(),
+        "cost_fairness": sends.max() - sends.min(),
+        "recv_min": rcvd.min(),
+        "recv_max": rcvd.max(),
+        "recv_fairness": rcvd.max() - rcvd.min(),
+        "bytes": total_bytes,
+        "bytes_per_delivery": total_bytes/deliveries if deliveries else np.inf
+    }
+    if deliveries:
+        for p, v in zip(percentiles, np.percentile(delays, percentiles)):
+            metrics[f"latency_p{p}"] = v
+    else:
+        for p in percentiles:
+            metrics[f"latency_p{p}"] = np.nan
+    return {k: float(v) for k, v in metrics.items()}
+
+def metrics_table(trials):
+    # {title: Results} -> {metric: {title: value}}
+    table = {}
+    for title, results in trials.items():
+        for metric, value in trial_metrics(results).items():
+            table.setdefault(metric, {})[title] = value
+    return table
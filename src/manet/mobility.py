@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+class Mobility:
+    """
+    Waypoint paths of every node held in arrays, with a cursor per node on
+    the segment it is travelling. step interpolates positions and
+    velocities of all nodes at once; vehicle returns a view that reads a
+    node's row, so nothing has to be pushed into vehicles afterwards.
+    x, y, x_vel and y_vel are each written by a single operation per step,
+    so threads reading vehicles never see a partly computed value.
+    """
+    def __init__(self, paths):
+        # paths: nid: [(x, y, t), ...] with increasing t
+        self.node_ids = list(paths)
+        self.__index = {nid: i for i, nid in enumerate(self.node_ids)}
+        n = len(self.node_ids)
+        length = max(len(p) for p in paths.values()) + 1
+        # pad each path by parking at its last waypoint forever
+        self.__xs = np.empty((n, length))
+        self.__ys = np.empty((n, length))
+        self.__ts = np.full((n, length), np.inf)
+        for i, nid in enumerate(self.node_ids):
+            path = np.asarray(paths[nid], dtype=float)
+            self.__xs[i, :len(path)] = path[:, 0]
+            self.__ys[i, :len(path)] = path[:, 1]
+            self.__ts[i, :len(path)] = path[:, 2]
+            self.__xs[i, len(path):] = path[-1, 0]
+            self.__ys[i, len(path):] = path[-1, 1]
+        self.__cursor = np.zeros(n, dtype=np.intp)
+        # segment each node is on, reloaded only when its cursor moves
+        self.__t0 = np.empty(n)
+        self.__t1 = np.empty(n)
+        self.__x0 = np.empty(n)
+        self.__y0 = np.empty(n)
+        self.__vx = np.empty(n)
+        self.__vy = np.empty(n)
+        self.__elapsed = np.empty(n) # scratch
+        self.__offset = np.empty(n) # scratch
+        self.__load(np.arange(n))
+        self.x = self.__xs[:, 0].copy()
+        self.y = self.__ys[:, 0].copy()
+        self.x_vel = self.__vx.copy()
+        self.y_vel = self.__vy.copy()
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def index(self, nid):
+        return self.__index[nid]
+
+    def __load(self, rows):
+        cursor = self.__cursor[rows]
+        x0 = self.__xs[rows, cursor]
+        y0 = self.__ys[rows, cursor]
+        t0 = self.__ts[rows, cursor]
+        t1 = self.__ts[rows, cursor + 1]
+        dt = t1 - t0
+        self.__x0[rows] = x0
+        self.__y0[rows] = y0
+        self.__t0[rows] = t0
+        self.__t1[rows] = t1
+        # parked nodes have dt == inf, giving zero velocity
+        self.__vx[rows] = (self.__xs[rows, cursor + 1] - x0)/dt
+        self.__vy[rows] = (self.__ys[rows, cursor + 1] - y0)/dt
+
+    def step(self, tc):
+        # move cursors past consumed waypoints, usually at most once
+        behind = np.flatnonzero(self.__t1 < tc)
+        while len(behind) > 0:
+            self.__cursor[behind] += 1
+            self.__load(behind)
+            behind = behind[self.__t1[behind] < tc]
+        elapsed = np.subtract(tc, self.__t0, out=self.__elapsed)
+        offset = np.multiply(elapsed, self.__vx, out=self.__offset)
+        np.add(offset, self.__x0, out=self.x)
+        offset = np.multiply(elapsed, self.__vy, out=self.__offset)
+        np.add(offset, self.__y0, out=self.y)
+        np.copyto(self.x_vel, self.__vx)
+        np.copyto(self.y_vel, self.__vy)
+
+    def vehicle(self, nid):
+        return MobilityVehicle(self, self.__index[nid])
+
+
+class MobilityVehicle:
+    """ vehicle whose state is a row of a Mobility's arrays """
+    def __init__(self, mobility, i):
+        self.__m = mobility
+        self.__i = i
+
+    @property
+    def x(self):
+        return float(self.__m.x[self.__i])
+
+    @property
+    def y(self):
+        return float(self.__m.y[self.__i])
+
+    @property
+    def x_vel(self):
+        return float(self.__m.x_vel[self.__i])
+
+    @property
+    def y_vel(self):
+        return float(self.__m.y_vel[self.__i])
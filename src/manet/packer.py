@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+
+class FramePacker:
+    """
+    Packs (channel, content) messages into as few frames of at most mtu
+    bytes as it can: first-fit decreasing, with urgent messages (an event
+    some destination, or this node, matched with hint 0) placed first so
+    they lead the frames sent. A message too large for any frame is
+    encoded on its own, split into chunks and carried as "fragment"
+    messages: ((nid, seq), index, count, chunk). An mtu too small for a
+    fragment to carry any data raises ValueError.
+    """
+    # room kept for the message count of a frame
+    frame_overhead = 3
+
+    def __init__(self, codec, mtu, nid, seq=0):
+        # every fragment has to carry some data, even far into the sequence
+        # numbers and with a large count
+        large = 2**32
+        fragment = ("fragment", ((nid, seq + large), large, large, b""))
+        if mtu - len(codec.encode([fragment])) - 5 <= 0:
+            raise ValueError(f"mtu of {mtu} bytes leaves no room to fragment")
+        self.__codec = codec
+        self.__mtu = mtu
+        self.__nid = nid
+        self.__seq = seq # first fragment id, see HintRouter incarnation
+        self.__frames = 0
+        self.__bytes = 0
+        self.__fill = 0
+        self.__channel_bytes = {} # channel: bytes of its messages in frames
+        self.__fragmented = 0
+        self.__oversized = 0
+
+    @property
+    def stats(self):
+        return {
+                "frames": self.__frames,
+                "bytes": self.__bytes,
+                "fill_ratio": (
+                    self.__fill/self.__frames if self.__frames else None),
+                "channel_bytes": dict(self.__channel_bytes),
+                "fragmented": self.__fragmented,
+                "oversized": self.__oversized
+        }
+
+    @staticmethod
+    def urgent(msg):
+        channel, content = msg
+        return channel == "message" and 0 in content[1].values()
+
+    def __fragments(self, msg):
+        data = self.__codec.encode([msg])
+        fid = (self.__nid, self.__seq)
+        # fields of a fragment can be no larger than with index and count of
+        # len(data), plus a few bytes for the chunk's length
+        n = len(data)
+        header = len(self.__codec.encode([("fragment", (fid, n, n, b""))]))
+        step = self.__mtu - header - 5
+        chunks = [data[i:i + step] for i in range(0, len(data), step)]
+        self.__seq += 1
+        self.__fragmented += 1
+        return [
+                ("fragment", (fid, i, len(chunks), chunk))
+                for i, chunk in enumerate(chunks)]
+
+    def pack(self, messages):
+        capacity = self.__mtu - self.frame_overhead
+        sized = [] # (not urgent, -size, order, msg, size)
+        for msg in messages:
+            pieces = [msg]
+            size = len(self.__codec.encode(pieces)) - 1
+            if size > capacity:
+                pieces = self.__fragments(msg)
+            for piece in pieces:
+                if piece is not msg:
+                    size = len(self.__codec.encode([piece])) - 1
+                order = len(sized)
+                sized.append((not self.urgent(msg), -size, order, piece, size))
+                # fragments count for the channel of what they carry
+                channel = msg[0]
+                self.__channel_bytes[channel] = (
+                        self.__channel_bytes.get(channel, 0) + size)
+        sized.sort(key=lambda s: s[:3])
+        bins = [] # [free, [msg, ...]]
+        for not_urgent, neg_size, order, msg, size in sized:
+            for b in bins:
+                if b[0] >= size:
+                    b[0] -= size
+                    b[1].append(msg)
+                    break
+            else:
+                bins.append([capacity - size, [msg]])
+        frames = []
+        for free, batch in bins:
+            frames.extend(self.__encode(batch))
+        return frames
+
+    def __encode(self, batch):
+        # sizes are exact for BinaryCodec, other codecs may need a split
+        frame = self.__codec.encode(batch)
+        if len(frame) > self.__mtu and len(batch) > 1:
+            half = len(batch)//2
+            return self.__encode(batch[:half]) + self.__encode(batch[half:])
+        if len(frame) > self.__mtu:
+            self.__oversized += 1
+        self.__frames += 1
+        self.__bytes += len(frame)
+        self.__fill += len(frame)/self.__mtu
+        return [frame]
+
+
+class Reassembler:
+    """
+    Collects fragments until every chunk of a frame has arrived and returns
+    the frame. Incomplete frames are dropped after ttl seconds or when more
+    than max_size are pending.
+    """
+    def __init__(self, *, ttl=10, max_size=1024):
+        self.__ttl = ttl
+        self.__max_size = max_size
+        # fid: (first seen, count, {index: chunk})
+        self.__pending = OrderedDict()
+        self.__reassembled = 0
+        self.__dropped = 0
+
+    @property
+    def stats(self):
+        return {
+                "pending": len(self.__pending),
+                "reassembled": self.__reassembled,
+                "dropped": self.__dropped
+        }
+
+    def add(self, content, t):
+        fid, index, count, chunk = content
+        if not 0 <= index < count: # malformed
+            return None
+        while self.__pending: # expire oldest first
+            first, (seen, *rest) = next(iter(self.__pending.items()))
+            if seen > t - self.__ttl and len(self.__pending) < self.__max_size:
+                break
+            del self.__pending[first]
+            self.__dropped += 1
+        try:
+            seen, expected, chunks = self.__pending[fid]
+        except KeyError:
+            seen, expected, chunks = self.__pending[fid] = (t, count, {})
+        if count != expected: # fragments disagree, the frame is lost
+            del self.__pending[fid]
+            self.__dropped += 1
+            return None
+        chunks[index] = chunk
+        # indices are all below count, so count of them means every one
+        if len(chunks) < count:
+            return None
+        del self.__pending[fid]
+        self.__reassembled += 1
+        return b"".join(chunks[i] for i in range(count))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from manet.mobility import Mobility
+
+
+def round_robin_partition(node_ids, num_parts):
+    return [list(node_ids[i::num_parts]) for i in range(num_parts)]
+
+def spatial_partition(positions, num_parts):
+    """
+    Recursive coordinate bisection of {nid: (x, y)} into num_parts groups
+    of (nearly) equal size, each covering a compact region, so radio
+    neighbors mostly end up in the same group. Every group gets at least
+    one node, so num_parts may not exceed the number of nodes.
+    """
+    node_ids = list(positions)
+    if not 0 < num_parts <= len(node_ids):
+        raise ValueError(
+                f"cannot split {len(node_ids)} nodes into {num_parts} parts")
+    xy = np.array([positions[nid] for nid in node_ids], dtype=float)
+    parts = []
+    def bisect(rows, k):
+        if k == 1:
+            parts.append([node_ids[i] for i in rows])
+            return
+        # split along the wider extent, sizes proportional to part counts
+        spread = xy[rows].max(axis=0) - xy[rows].min(axis=0)
+        axis = int(np.argmax(spread))
+        rows = rows[np.argsort(xy[rows, axis], kind="stable")]
+        k_left = k//2
+        cut = len(rows)*k_left//k
+        bisect(rows[:cut], k_left)
+        bisect(rows[cut:], k - k_left)
+    bisect(np.arange(len(node_ids)), num_parts)
+    return parts
+
+def partition_paths(paths, num_parts, t=0):
+    # spatial partition of where every node is at time t
+    mobility = Mobility(paths)
+    mobility.step(t)
+    positions = {
+            nid: (mobility.x[i], mobility.y[i])
+            for i, nid in enumerate(mobility.node_ids)}
+    return spatial_partition(positions, num_parts)
+
+def rebalance_plan(paths, num_parts, *, interval=None, duration=0):
+    """
+    Partitions recomputed every interval seconds as vehicles migrate (only
+    the one at t=0 if interval is None). Each new partition is relabelled
+    to overlap its predecessor as much as possible so few nodes have to
+    move. Returns [(t, parts, migrations)].
+    """
+    if interval is None:
+        return [(0, partition_paths(paths, num_parts), 0)]
+    plan = []
+    previous = None
+    t = 0
+    while t < duration:
+        parts = partition_paths(paths, num_parts, t)
+        migrations = 0
+        if previous is not None:
+            parts, migrations = relabel(previous, parts)
+        plan.append((t, parts, migrations))
+        previous = parts
+        t += interval
+    return plan
+
+def relabel(previous, parts):
+    # greedy matching of new parts to old labels by shared nodes
+    old = [set(p) for p in previous]
+    overlap = [[len(old_part & set(p)) for old_part in old] for p in parts]
+    pairs = sorted(
+            ((overlap[i][j], i, j)
+            for i in range(len(parts)) for j in range(len(old))),
+            reverse=True)
+    label = {}
+    used = set()
+    for shared, i, j in pairs:
+        if i not in label and j not in used:
+            label[i] = j
+            used.add(j)
+    relabelled = [None]*len(parts)
+    for i, j in label.items():
+        relabelled[j] = parts[i]
+    migrations = sum(
+            len(p) - overlap[i][label[i]] for i, p in enumerate(parts))
+    return relabelled, migrations
+
+def owner(plan, nid, t):
+    # index of the part holding nid at time t under plan
+    parts = [parts for start, parts, *rest in plan if start <= t][-1]
+    for i, part in enumerate(parts):
+        if nid in part:
+            return i
+    raise KeyError(nid)
+
+def cross_partition_traffic(logs, plan, reach):
+    """
+    Counts deliveries of the frames in logs["send"] to nodes within reach of
+    the sender, split by whether the receiver sits in another partition
+    (those pay inter-process transport). plan is [(t, parts, ...)] as from
+    rebalance_plan, [(0, parts)] for a fixed partition. Returns
+    (cross, total).
+    """
+    mobility = Mobility(logs["paths"])
+    part_of = np.empty(len(mobility), dtype=np.intp)
+    sends = sorted(
+            (t, mobility.index(nid))
+            for nid, log in logs["send"].items()
+            for t, data in log)
+    plan = list(plan)
+    cross = 0
+    total = 0
+    r2 = reach*reach
+    for t, i in sends:
+        while plan and plan[0][0] <= t: # partition in effect at t
+            for p, nids in enumerate(plan.pop(0)[1]):
+                for nid in nids:
+                    part_of[mobility.index(nid)] = p
+        mobility.step(t)
+        d2 = (mobility.x - mobility.x[i])**2 + (mobility.y - mobility.y[i])**2
+        d2[i] = np.inf # not a receiver of its own frame
+        receivers = d2 <= r2
+        total += int(np.count_nonzero(receivers))
+        cross += int(np.count_nonzero(receivers & (part_of != part_of[i])))
+    return cross, total
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import glob
+import json
+import os
+import re
+
+from manet.metrics import trial_metrics
+from manet.results import load_results
+
+# e.g. gossip_0_5_seed_47, hint_2_seed_47_b5_n100_r75_des
+name_pattern = re.compile(
+        r"(?P<protocol>[a-z]+)_(?P<param>\d+(?:_\d+)?)_seed_(?P<seed>\d+)"
+        r"(?:_b\d+)?(?:_n(?:\d+)_r(?P<radio_range>\d+))?")
+# results named like this without a medium in meta.json come from the
+# discrete-event simulator, anything else older ran on the real-time radio
+des_suffixes = ("_sim", "_des")
+
+
+class Trial:
+    """
+    One result directory. Protocol, parameter, seed, network and medium
+    ("des" for the discrete-event simulator, "realtime" for threads on the
+    real-time radio) come from meta.json when it has them, otherwise from
+    the directory name; the results are only opened when first used.
+    """
+    def __init__(self, path):
+        self.path = path
+        fname = os.path.join(path, "meta.json")
+        with open(fname) as f:
+            meta = json.load(f)
+        self.created = meta.get("created", os.path.getmtime(fname))
+        name = os.path.basename(os.path.normpath(path))
+        m = name_pattern.match(name)
+        parsed = m.groupdict() if m else {}
+        self.protocol = meta.get("protocol", parsed.get("protocol", name))
+        param = str(meta.get("param", parsed.get("param", "")))
+        self.param = param.replace("_", ".")
+        self.seed = int(meta.get("seed", parsed.get("seed", -1)))
+        self.num_nodes = meta.get("num_nodes", len(meta["node_ids"]))
+        radio_range = meta.get("radio_range", parsed.get("radio_range"))
+        self.radio_range = None if radio_range is None else int(radio_range)
+        self.medium = meta.get(
+                "medium", "des" if name.endswith(des_suffixes) else "realtime")
+        self.__results = None
+
+    @property
+    def title(self):
+        # as used by evaluation.plot_results, e.g. "gossip 0.5"
+        return f"{self.protocol} {self.param}".strip()
+
+    @property
+    def results(self):
+        if self.__results is None:
+            self.__results = load_results(self.path)
+        return self.__results
+
+
+class TrialRegistry:
+    """
+    Result directories matching pattern, with their metrics cached in a
+    metrics.json sidecar keyed by the mtime and size of the result files,
+    so only new or rewritten trials are recomputed.
+    """
+    sidecar = "metrics.json"
+
+    def __init__(self, pattern="./results/*"):
+        self.trials = [
+                Trial(path) for path in sorted(glob.glob(pattern))
+                if os.path.exists(os.path.join(path, "meta.json"))]
+
+    def select(self, *, 
+            protocol=None, param=None, seed=None, num_nodes=None,
+            radio_range=None, medium=None):
+        return [
+                t for t in self.trials
+                if (protocol is None or t.protocol == protocol)
+                and (param is None or t.param == str(param))
+                and (seed is None or t.seed == seed)
+                and (num_nodes is None or t.num_nodes == num_nodes)
+                and (radio_range is None or t.radio_range == radio_range)
+                and (medium is None or t.medium == medium)]
+
+    def __key(self, trial):
+        key = []
+        for fname in sorted(os.listdir(trial.path)):
+            if fname == self.sidecar:
+                continue
+            st = os.stat(os.path.join(trial.path, fname))
+            key.append([fname, st.st_mtime_ns, st.st_size])
+        return key
+
+    def metrics(self, trial):
+        key = self.__key(trial)
+        sidecar = os.path.join(trial.path, self.sidecar)
+        try:
+            with open(sidecar) as f:
+                cached = json.load(f)
+            if cached["key"] == key:
+                return cached["metrics"]
+        except (OSError, ValueError, KeyError):
+            pass
+        metrics = trial_metrics(trial.results)
+        tmp = f"{sidecar}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"key": key, "metrics": metrics}, f)
+        os.replace(tmp, sidecar)
+        return metrics
+
+    def table(self, trials=None):
+        # {metric: {title: value}} like metrics.metrics_table, raises
+        # ValueError rather than let one of two trials of a title win
+        trials = self.trials if trials is None else trials
+        check_unique(trials)
+        table = {}
+        for trial in trials:
+            for metric, value in self.metrics(trial).items():
+                table.setdefault(metric, {})[trial.title] = value
+        return table
+
+
+def newest(trials):
+    # one trial per title, the most recently created one (ties broken by
+    # path) when e.g. a benchmark reran a converted pickle's trial
+    chosen = {}
+    for trial in sorted(trials, key=lambda t: (t.created, t.path)):
+        chosen[trial.title] = trial
+    return sorted(chosen.values(), key=lambda t: t.path)
+
+def check_unique(trials):
+    paths = {}
+    for trial in trials:
+        paths.setdefault(trial.title, []).append(trial.path)
+    duplicates = {title: p for title, p in paths.items() if len(p) > 1}
+    if duplicates:
+        raise ValueError(
+                "several trials of the same title, select fewer: "
+                f"{duplicates}")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Columnar store for benchmark logs. A result is a directory holding one
+.npy file per column plus meta.json:
+    pub.node_id, pub.topic, pub.time
+    sub.node_id, sub.topic, sub.time, sub.sender, sub.send_time
+    send.node_id, send.time, send.bytes
+    recv.node_id, recv.time, recv.bytes
+    paths.node_id, paths.x, paths.y, paths.time
+meta.json keeps the run parameters along with the node ids, each
+subscriber's topics and when the run was saved ("created", unix time), which the tables cannot express when a node never
+sent or received anything. Payloads are reduced to their length. Runs
+that collected router stats (see stats.py) also get stats.json, node id:
+router.stats.
+"""
+
+import glob
+import json
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+
+tables = {
+    "pub": ("node_id", "topic", "time"),
+    "sub": ("node_id", "topic", "time", "sender", "send_time"),
+    "send": ("node_id", "time", "bytes"),
+    "recv": ("node_id", "time", "bytes"),
+    "paths": ("node_id", "x", "y", "time")
+}
+dtypes = {
+    "node_id": np.int64, "topic": np.int64, "sender": np.int64,
+    "bytes": np.int64, "time": np.float64, "send_time": np.float64,
+    "x": np.float64, "y": np.float64
+}
+
+
+def logs_to_columns(logs):
+    # nested log dicts of random_waveform_benchmark -> {table: {col: array}}
+    rows = {
+        "pub": [
+            (nid, topic, t)
+            for nid, plist in logs["pub"].items() for topic, t in plist],
+        "sub": [
+            (nid, topic, t, sender, send_time)
+            for nid, topics in logs["sub"].items()
+            for topic, rlist in topics.items()
+            for t, (sender, send_time) in rlist],
+        "send": [
+            (nid, t, len(data))
+            for nid, log in logs["send"].items() for t, data in log],
+        "recv": [
+            (nid, t, len(data))
+            for nid, log in logs["recv"].items() for t, data in log],
+        "paths": [
+            (nid, x, y, t)
+            for nid, path in logs["paths"].items() for x, y, t in path]
+    }
+    columns = {}
+    for table, names in tables.items():
+        values = list(zip(*rows[table])) or [()]*len(names)
+        columns[table] = {
+                name: np.array(v, dtype=dtypes[name])
+                for name, v in zip(names, values)}
+    return columns
+
+def save_results(path, logs, meta=None):
+    """ writes logs to a new result directory, which must not exist """
+    os.makedirs(path)
+    for table, columns in logs_to_columns(logs).items():
+        for name, column in columns.items():
+            np.save(os.path.join(path, f"{table}.{name}.npy"), column)
+    meta = dict(meta or {})
+    meta.setdefault("created", time.time())
+    meta["node_ids"] = sorted(
+            set(logs["send"]) | set(logs["recv"]) | set(logs["paths"]))
+    # json keys are strings, keep pairs instead
+    meta["subs"] = [
+            [nid, sorted(topics)] for nid, topics in logs["sub"].items()]
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+    if logs.get("stats"):
+        with open(os.path.join(path, "stats.json"), "w") as f:
+            json.dump({str(nid): s for nid, s in logs["stats"].items()}, f)
+
+def publish_results(out_dir, name, logs, meta=None, *, replace=False):
+    """
+    Saves logs as out_dir/<name>, writing them to a temporary directory
+    first and moving that into place in a single rename, so an interrupted
+    run never leaves a partial result behind. An existing result is kept
+    (and None returned) unless replace is set.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, name)
+    tmp = os.path.join(out_dir, f".{name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    save_results(tmp, logs, meta)
+    if replace and os.path.exists(path):
+        old = f"{tmp}.old"
+        os.rename(path, old)
+        os.rename(tmp, path)
+        shutil.rmtree(old)
+        return path
+    try:
+        os.rename(tmp, path)
+    except OSError: # finished by someone else in the meantime
+        shutil.rmtree(tmp)
+        return None
+    return path
+
+
+class Results:
+    """
+    Result directory opened lazily, each column is memory-mapped the first
+    time it is read: results["send", "time"] or results.column(...).
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.__columns = {}
+
+    @property
+    def node_ids(self):
+        return self.meta["node_ids"]
+
+    @property
+    def subscribers(self):
+        return [nid for nid, topics in self.meta["subs"]]
+
+    @property
+    def stats(self):
+        # node id: router stats, empty if the run did not collect them
+        try:
+            with open(os.path.join(self.path, "stats.json")) as f:
+                return {int(nid): s for nid, s in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+
+    def column(self, table, name):
+        key = (table, name)
+        try:
+            return self.__columns[key]
+        except KeyError:
+            pass
+        fname = os.path.join(self.path, f"{table}.{name}.npy")
+        try:
+            column = np.load(fname, mmap_mode="r")
+        except ValueError: # older numpy cannot map an empty file
+            column = np.load(fname)
+        self.__columns[key] = column
+        return column
+
+    def __getitem__(self, key):
+        return self.column(*key)
+
+
+def load_results(path):
+    return Results(path)
+
+def convert_pickles(pattern="./pickles/*.pickle", out_dir="./results"):
+    # one result directory per pickled log dict, existing ones are skipped
+    for fname in sorted(glob.glob(pattern)):
+        title = os.path.splitext(os.path.basename(fname))[0]
+        path = os.path.join(out_dir, title)
+        if os.path.exists(path):
+            continue
+        with open(fname, "rb") as f:
+            logs = pickle.load(f)
+        # the pickled runs all used the real-time radio with a 75 m range
+        meta = {
+                "title": title, "source": fname, "medium": "realtime",
+                "radio_range": 75, "created": os.path.getmtime(fname)}
+        save_results(path, logs, meta)
+        print(f"{fname} -> {path}")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import math
+
+
+class Scheduler:
+    """
+    Min-heap of pending transmissions keyed on send time. Each key (a mid
+    or a beacon token) has at most one live entry; rescheduling or
+    cancelling a key leaves its old heap entry behind to be skipped lazily
+    when it surfaces.
+    """
+    def __init__(self):
+        self.__heap = [] # (send-time, seq, key)
+        self.__live = {} # key: (send-time, seq, msg)
+        self.__seq = itertools.count()
+
+    def __len__(self):
+        return len(self.__live)
+
+    def __contains__(self, key):
+        return key in self.__live
+
+    def schedule(self, key, t, msg):
+        seq = next(self.__seq)
+        self.__live[key] = (t, seq, msg)
+        heapq.heappush(self.__heap, (t, seq, key))
+        self.__compact()
+
+    def cancel(self, key):
+        # heap entry is discarded once it reaches the top
+        self.__live.pop(key, None)
+        self.__compact()
+
+    def __compact(self):
+        # rebuild once dead entries dominate so the heap stays O(live)
+        if len(self.__heap) > 2*len(self.__live) + 64:
+            self.__heap = [
+                    (t, seq, k) for k, (t, seq, msg) in self.__live.items()]
+            heapq.heapify(self.__heap)
+
+    def __prune(self):
+        heap = self.__heap
+        while heap:
+            t, seq, key = heap[0]
+            try:
+                live = self.__live[key]
+            except KeyError: # cancelled
+                heapq.heappop(heap)
+                continue
+            if live[1] != seq: # rescheduled
+                heapq.heappop(heap)
+                continue
+            return
+
+    def next_deadline(self):
+        self.__prune()
+        if self.__heap:
+            return self.__heap[0][0]
+        return math.inf
+
+    def pop_due(self, current_time):
+        messages = []
+        heap = self.__heap
+        self.__prune()
+        while heap and heap[0][0] <= current_time:
+            t, seq, key = heapq.heappop(heap)
+            messages.append(self.__live.pop(key)[2])
+            self.__prune()
+        return messages
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import queue
+import struct
+from threading import Lock
+import time
+from multiprocessing import shared_memory
+
+
+class ShmRing:
+    """
+    Single-producer single-consumer ring of length-prefixed frames in a
+    multiprocessing.shared_memory block. Frames are copied straight into
+    shared memory, nothing is pickled. Use one ring per (producer,
+    consumer) pair; the ring can be passed to a Process and re-attaches by
+    name in the child.
+
+    layout: u64 head (bytes written), u64 tail (bytes read), data
+    frame:  u32 length, bytes; WRAP as length means continue at offset 0
+    A frame with its length takes at most half the capacity, so the space
+    skipped at the end before it wraps always leaves room for it once the
+    ring is empty.
+    """
+    header = struct.Struct("<QQ")
+    counter = struct.Struct("<Q")
+    length = struct.Struct("<I")
+    WRAP = 0xffffffff
+
+    def __init__(self, capacity=1 << 22, name=None):
+        self.__owner = name is None
+        if self.__owner:
+            self.__shm = shared_memory.SharedMemory(
+                    create=True, size=self.header.size + capacity)
+            self.header.pack_into(self.__shm.buf, 0, 0, 0)
+        else:
+            self.__shm = shared_memory.SharedMemory(name=name)
+        self.__capacity = capacity
+
+    def __reduce__(self):
+        return (ShmRing, (self.__capacity, self.__shm.name))
+
+    @property
+    def name(self):
+        return self.__shm.name
+
+    def __counters(self):
+        return self.header.unpack_from(self.__shm.buf, 0)
+
+    def empty(self):
+        head, tail = self.__counters()
+        return head == tail
+
+    def try_put(self, frame):
+        capacity = self.__capacity
+        n = len(frame)
+        if n + self.length.size > capacity//2 or n >= self.WRAP:
+            raise ValueError(f"frame of {n} bytes does not fit ring")
+        head, tail = self.__counters()
+        offset = head % capacity
+        pad = 0
+        if capacity - offset < self.length.size + n: # wrap to offset 0
+            pad = capacity - offset
+        if head + pad + self.length.size + n - tail > capacity: # full
+            return False
+        buf = self.__shm.buf
+        base = self.header.size
+        if pad >= self.length.size:
+            self.length.pack_into(buf, base + offset, self.WRAP)
+        if pad > 0:
+            offset = 0
+        self.length.pack_into(buf, base + offset, n)
+        start = base + offset + self.length.size
+        buf[start:start + n] = frame
+        # publish the frame only once its bytes are in place
+        self.counter.pack_into(buf, 0, head + pad + self.length.size + n)
+        return True
+
+    def try_get(self):
+        capacity = self.__capacity
+        head, tail = self.__counters()
+        if head == tail:
+            return None
+        buf = self.__shm.buf
+        base = self.header.size
+        offset = tail % capacity
+        if capacity - offset < self.length.size:
+            tail += capacity - offset # too short for a length, skipped
+            offset = 0
+        else:
+            n, = self.length.unpack_from(buf, base + offset)
+            if n == self.WRAP:
+                tail += capacity - offset
+                offset = 0
+        n, = self.length.unpack_from(buf, base + offset)
+        start = base + offset + self.length.size
+        frame = bytes(buf[start:start + n])
+        self.counter.pack_into(buf, 8, tail + self.length.size + n)
+        return frame
+
+    def put(self, frame, timeout=None):
+        if self.try_put(frame):
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 1e-5
+        while not self.try_put(frame):
+            if deadline is not None and time.monotonic() > deadline:
+                raise queue.Full
+            time.sleep(delay)
+            delay = min(2*delay, 1e-3)
+
+    def get(self, timeout=None):
+        frame = self.try_get()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 1e-5
+        while frame is None:
+            if deadline is not None and time.monotonic() > deadline:
+                raise queue.Empty
+            time.sleep(delay)
+            delay = min(2*delay, 1e-3)
+            frame = self.try_get()
+        return frame
+
+    def close(self):
+        self.__shm.close()
+        if self.__owner:
+            self.__shm.unlink()
+
+
+class ShmLogQueue:
+    """
+    Drop-in for the trx_logs_q Queue of ("send" | "recv", nid, time, data)
+    records, carried over a ShmRing as a packed header plus the raw frame.
+    Threads of one process may share it as producers.
+    """
+    record = struct.Struct("<Bqd")
+    channels = ("send", "recv")
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.__lock = Lock()
+
+    def __reduce__(self):
+        return (ShmLogQueue, (self.ring,))
+
+    def put(self, item, timeout=None):
+        channel, nid, t, data = item
+        frame = self.record.pack(self.channels.index(channel), nid, t) + data
+        with self.__lock:
+            self.ring.put(frame, timeout=timeout)
+
+    def get(self, timeout=None):
+        frame = self.ring.get(timeout=timeout)
+        channel, nid, t = self.record.unpack_from(frame, 0)
+        return (self.channels[channel], nid, t, frame[self.record.size:])
+
+    def get_nowait(self):
+        return self.get(timeout=0)
+
+    def empty(self):
+        return self.ring.empty()
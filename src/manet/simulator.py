@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import math
+
+from manet.hint_router import HintRouter
+
+
+class Simulator:
+    """
+    Discrete-event engine: callbacks run in (time, insertion) order and the
+    virtual clock jumps straight to the next event, so runs are as fast as
+    the CPU allows and identical for identical inputs.
+    """
+    def __init__(self):
+        self.__time = 0
+        self.__events = [] # (time, seq, callback, args)
+        self.__seq = itertools.count()
+
+    @property
+    def time(self):
+        return self.__time
+
+    def __len__(self):
+        return len(self.__events)
+
+    def schedule(self, t, callback, *args):
+        heapq.heappush(
+                self.__events,
+                (max(t, self.__time), next(self.__seq), callback, args))
+
+    def run(self, until=math.inf):
+        # re-entrant, an event may itself run the simulator (e.g. sleep)
+        events = self.__events
+        while events and events[0][0] <= until:
+            t, seq, callback, args = heapq.heappop(events)
+            self.__time = t
+            callback(*args)
+        if until != math.inf and until > self.__time:
+            self.__time = until
+
+
+class VirtualClock:
+    """ stands in for hmap's Clock, sleeping runs the simulation forward """
+    def __init__(self, simulator):
+        self.__sim = simulator
+
+    @property
+    def time(self):
+        return self.__sim.time
+
+    def start(self):
+        pass
+
+    def sleep(self, duration):
+        self.__sim.run(until=self.__sim.time + duration)
+
+
+class Medium:
+    """
+    In-process radio shared by SimTransceivers. A frame reaches every other
+    transceiver whose recv range overlaps the sender's send range when it
+    is sent (this reproduces the delivery counts of RadioTransceiver runs),
+    after its airtime at data_rate. Frames over max_buffer_size are dropped
+    and collisions are not modelled. Receivers are looked up in index (a
+    GridIndex kept up to date by the caller) or, without one, by checking
+    every transceiver.
+    """
+    def __init__(self, simulator, *,
+            data_rate, send_range, recv_range, max_buffer_size, index=None,
+            **kwargs):
+        self.__sim = simulator
+        self.__bits_per_second = data_rate*1000 # kbps
+        self.__range = send_range + recv_range
+        self.__max_buffer_size = max_buffer_size
+        self.__index = index
+        self.__trxs = {} # nid: transceiver
+
+    @property
+    def range(self):
+        return self.__range
+
+    @property
+    def index(self):
+        return self.__index
+
+    @index.setter
+    def index(self, index):
+        self.__index = index
+
+    def attach(self, trx):
+        self.__trxs[trx.nid] = trx
+
+    def detach(self, trx):
+        self.__trxs.pop(trx.nid, None)
+
+    def receivers(self, sender):
+        x, y = sender.x, sender.y
+        if self.__index is not None:
+            trxs = self.__trxs
+            receivers = []
+            for nid in self.__index.query(x, y, self.__range):
+                trx = trxs.get(nid)
+                if trx is not None and trx is not sender:
+                    receivers.append(trx)
+            return receivers
+        r2 = self.__range**2
+        return [
+                trx for trx in self.__trxs.values()
+                if trx is not sender and (trx.x - x)**2 + (trx.y - y)**2 <= r2]
+
+    def send(self, sender, data):
+        if len(data) > self.__max_buffer_size:
+            return False
+        arrival = self.__sim.time + 8*len(data)/self.__bits_per_second
+        for trx in self.receivers(sender):
+            self.__sim.schedule(arrival, trx.deliver, data)
+        return True
+
+
+class SimTransceiver:
+    """
+    Transceiver on a Medium, frames are pushed to on_recv instead of being
+    polled. Logs to trx_q like radio.Transceiver.
+    """
+    def __init__(self, nid, trx_q, *, medium, context):
+        self.nid = nid
+        self.trx_q = trx_q
+        self.on_recv = None
+        self.__medium = medium
+        self.__ctx = context
+        medium.attach(self)
+
+    @property
+    def x(self):
+        return self.__ctx.x
+
+    @property
+    def y(self):
+        return self.__ctx.y
+
+    @property
+    def time(self):
+        return self.__ctx.time
+
+    def send(self, data, timeout=None):
+        retval = self.__medium.send(self, data)
+        self.trx_q.put(("send", self.nid, self.time, data))
+        return retval
+
+    def deliver(self, data):
+        if self.on_recv is None: # closed or not yet listening
+            return
+        self.trx_q.put(("recv", self.nid, self.time, data))
+        self.on_recv(data)
+
+    def close(self):
+        self.on_recv = None
+        self.__medium.detach(self)
+
+
+class SimHintRouter(HintRouter):
+    """
+    HintRouter driven by Simulator events: step runs when a frame arrives,
+    when woken, and at the deadline the previous step asked for.
+    """
+    # smallest step forward when a deadline has already passed
+    resolution = 1e-6
+
+    def __init__(self, *, simulator, **kwargs):
+        self.__sim = simulator
+        self.__trx = kwargs["transceiver"]
+        self.__timer = 0 # only the newest deadline event is honoured
+        super().__init__(**kwargs)
+
+    def start(self):
+        self.__trx.on_recv = self.__step
+        self.wake()
+
+    def wake(self):
+        self.__sim.schedule(self.__sim.time, self.__step, b"")
+
+    def close(self):
+        self.__trx.close()
+
+    def __deadline(self, timer):
+        if timer == self.__timer:
+            self.__step(b"")
+
+    def __step(self, raw_data):
+        if self.__trx.on_recv is None: # closed
+            return
+        frames, timeout = self.step(raw_data)
+        for frame in frames:
+            self.__trx.send(frame)
+        self.__timer += 1
+        self.__sim.schedule(
+                self.__sim.time + max(timeout, self.resolution),
+                self.__deadline, self.__timer)
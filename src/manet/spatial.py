@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+
+import numpy as np
+
+
+class GridIndex:
+    """
+    Uniform grid over node positions for range queries. With cells as
+    large as the query radius a query only looks at the 3x3 block of cells
+    around the point, so its cost follows local density rather than the
+    number of nodes. update only re-buckets nodes that changed cell.
+    """
+    def __init__(self, node_ids, cell_size):
+        self.__node_ids = list(node_ids)
+        self.__cell_size = cell_size
+        self.__cells = {} # (cx, cy): set of row indices
+        n = len(self.__node_ids)
+        # no node is in a cell yet, first update places every node
+        self.__cx = np.full(n, np.iinfo(np.int64).min)
+        self.__cy = np.full(n, np.iinfo(np.int64).min)
+        self.__xs = np.zeros(n)
+        self.__ys = np.zeros(n)
+
+    @property
+    def cell_size(self):
+        return self.__cell_size
+
+    def update(self, xs, ys):
+        # xs, ys: positions aligned with node_ids, kept for exact queries
+        self.__xs = xs
+        self.__ys = ys
+        cx = np.floor_divide(xs, self.__cell_size).astype(np.int64)
+        cy = np.floor_divide(ys, self.__cell_size).astype(np.int64)
+        cells = self.__cells
+        for i in np.flatnonzero((cx != self.__cx) | (cy != self.__cy)):
+            old = (int(self.__cx[i]), int(self.__cy[i]))
+            try:
+                cell = cells[old]
+            except KeyError: # first placement
+                pass
+            else:
+                cell.discard(i)
+                if len(cell) == 0:
+                    del cells[old]
+            new = (int(cx[i]), int(cy[i]))
+            try:
+                cells[new].add(i)
+            except KeyError:
+                cells[new] = {i}
+        self.__cx = cx
+        self.__cy = cy
+
+    def query(self, x, y, radius):
+        # node ids within radius of (x, y)
+        cs = self.__cell_size
+        cx0 = math.floor((x - radius)/cs)
+        cx1 = math.floor((x + radius)/cs)
+        cy0 = math.floor((y - radius)/cs)
+        cy1 = math.floor((y + radius)/cs)
+        candidates = []
+        cells = self.__cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    candidates.extend(cell)
+        if len(candidates) == 0:
+            return []
+        rows = np.array(candidates, dtype=np.intp)
+        d2 = (self.__xs[rows] - x)**2 + (self.__ys[rows] - y)**2
+        node_ids = self.__node_ids
+        return [node_ids[i] for i in rows[d2 <= radius*radius]]
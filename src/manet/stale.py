@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+
+class StaleCache:
+    """
+    Duplicate-suppression cache of message ids. Entries are kept in arrival
+    order and expire once they are older than ttl, so memory is bounded by
+    the message rate over ttl and, as a hard cap, by max_size.
+    """
+    def __init__(self, *, ttl=30, max_size=2**16):
+        self.__ttl = ttl
+        self.__max_size = max_size
+        self.__seen = OrderedDict() # mid: time added
+        # sizing statistics
+        self.__inserts = 0
+        self.__hits = 0
+        self.__expired = 0 # evicted for being older than ttl
+        self.__evicted = 0 # evicted early because cache was full
+        self.__youngest_evicted = None # age of newest early eviction
+
+    def __len__(self):
+        return len(self.__seen)
+
+    def __contains__(self, mid):
+        if mid in self.__seen:
+            self.__hits += 1
+            return True
+        return False
+
+    def add(self, mid, current_time):
+        seen = self.__seen
+        # expire entries from the old end
+        expiry = current_time - self.__ttl
+        while seen:
+            oldest, t = next(iter(seen.items()))
+            if t > expiry:
+                break
+            del seen[oldest]
+            self.__expired += 1
+        if mid in seen:
+            seen.move_to_end(mid)
+        else:
+            self.__inserts += 1
+        seen[mid] = current_time
+        # enforce hard cap, evicting oldest still-live entries
+        while len(seen) > self.__max_size:
+            oldest, t = seen.popitem(last=False)
+            self.__evicted += 1
+            age = current_time - t
+            if self.__youngest_evicted is None or age < self.__youngest_evicted:
+                self.__youngest_evicted = age
+
+    @property
+    def stats(self):
+        # an early eviction younger than the longest in-flight time means
+        # max_size is too small and duplicates may be forwarded again
+        return {
+                "size": len(self.__seen),
+                "inserts": self.__inserts,
+                "hits": self.__hits,
+                "expired": self.__expired,
+                "evicted": self.__evicted,
+                "youngest_evicted_age": self.__youngest_evicted
+        }
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Router instrumentation cheap enough to leave on: counters are ints in a
+dict and histograms keep a count, total, max and power-of-two buckets of
+what they are given, timers being histograms of seconds bucketed in
+microseconds. Updates are not locked: a router updates its counters and
+histograms from the thread that steps it, except the wait timers of its
+TimedLocks, which other threads (e.g. publishers) add to as well. Those
+are only added to while holding their lock, so the threads contending
+for it also take turns updating its timer. Reading stats from another
+thread gives a snapshot that may be one update behind.
+"""
+
+from threading import Lock
+import time
+
+# bucket i counts values below 2**i (in units of 1/scale), the last one
+# everything larger
+num_buckets = 32
+
+
+class Histogram:
+    __slots__ = ("scale", "count", "total", "max", "buckets")
+
+    def __init__(self, scale=1):
+        self.scale = scale
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0]*num_buckets
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        i = int(value*self.scale).bit_length()
+        self.buckets[i if i < num_buckets else num_buckets - 1] += 1
+
+    def as_dict(self):
+        # trailing empty buckets are left out
+        n = len(self.buckets)
+        while n > 0 and self.buckets[n - 1] == 0:
+            n -= 1
+        return {
+                "scale": self.scale,
+                "count": self.count,
+                "total": self.total,
+                "mean": self.total/self.count if self.count else None,
+                "max": self.max,
+                "buckets": self.buckets[:n]}
+
+
+class Stats:
+    """
+    Named counters and histograms of one router. Counters named up front
+    start at 0 so hot paths can increment stats.counters[name] directly,
+    histogram and timer return the object to add to.
+    """
+    def __init__(self, counters=()):
+        self.counters = dict.fromkeys(counters, 0)
+        self.histograms = {}
+
+    def count(self, name, n=1):
+        try:
+            self.counters[name] += n
+        except KeyError:
+            self.counters[name] = n
+
+    def histogram(self, name, scale=1):
+        try:
+            return self.histograms[name]
+        except KeyError:
+            h = self.histograms[name] = Histogram(scale)
+            return h
+
+    def timer(self, name):
+        # seconds, bucketed in microseconds
+        return self.histogram(name, scale=1e6)
+
+    def as_dict(self):
+        return {
+                "counters": dict(self.counters),
+                "histograms": {
+                    name: h.as_dict() for name, h in self.histograms.items()}}
+
+
+class TimedLock:
+    """
+    Lock that adds the time spent waiting for it to a timer, acquiring it
+    uncontended costs no clock reads and is not recorded. The timer is
+    added to once the lock is held, so any number of threads may use it.
+    """
+    def __init__(self, timer):
+        self.__lock = Lock()
+        self.__timer = timer
+
+    def __enter__(self):
+        if self.__lock.acquire(False):
+            return self
+        start = time.perf_counter()
+        self.__lock.acquire()
+        self.__timer.add(time.perf_counter() - start)
+        return self
+
+    def __exit__(self, *exc):
+        self.__lock.release()
+
+
+def merge_stats(stats):
+    # sums Stats.as_dict() of several routers, e.g. a whole run
+    counters = {}
+    histograms = {}
+    for s in stats:
+        for name, n in s["counters"].items():
+            counters[name] = counters.get(name, 0) + n
+        for name, h in s["histograms"].items():
+            try:
+                m = histograms[name]
+            except KeyError:
+                histograms[name] = {**h, "buckets": list(h["buckets"])}
+                continue
+            m["count"] += h["count"]
+            m["total"] += h["total"]
+            m["max"] = max(m["max"], h["max"])
+            buckets = m["buckets"]
+            buckets.extend([0]*(len(h["buckets"]) - len(buckets)))
+            for i, b in enumerate(h["buckets"]):
+                buckets[i] += b
+    for m in histograms.values():
+        m["mean"] = m["total"]/m["count"] if m["count"] else None
+    return {"counters": counters, "histograms": histograms}
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+import itertools
+import os
+import time
+
+from manet import benchmarks
+from manet.results import publish_results
+
+# setting that names a trial of each protocol, e.g. hint_2, gossip_0_5
+params = {"hint": "credit", "gossip": "gossip_level"}
+
+
+def grid(*,
+        hint=(), gossip=(), seeds=(47,), num_nodes=(100,), radio_ranges=(75,)):
+    """
+    Configs for every combination of protocol setting, seed, node count and
+    radio range. hint takes (beacon_interval, credit) pairs, gossip takes
+    gossip levels.
+    """
+    settings = [
+            {"protocol": "hint", "beacon_interval": b, "credit": c}
+            for b, c in hint]
+    settings += [{"protocol": "gossip", "gossip_level": g} for g in gossip]
+    return [
+            {**setting, "seed": seed, "num_nodes": n, "radio_range": r}
+            for setting, seed, n, r in itertools.product(
+                settings, seeds, num_nodes, radio_ranges)]
+
+def config_name(config):
+    # registry.Trial parses protocol, parameter and seed from the prefix
+    protocol = config["protocol"]
+    param = str(config[params[protocol]]).replace(".", "_")
+    name = f"{protocol}_{param}_seed_{config['seed']}"
+    if protocol == "hint":
+        name += f"_b{config['beacon_interval']}"
+    return name + f"_n{config['num_nodes']}_r{config['radio_range']}"
+
+def run_config(config, out_dir):
+    """
+    Runs one config and publishes its result as out_dir/<name>, see
+    results.publish_results.
+    Hint routers run in the discrete-event simulator; hive-map's
+    GossipRouter runs its own threads and so runs in real time.
+    """
+    start = time.perf_counter()
+    scenario = benchmarks.random_waveform_scenario(
+            seed=config["seed"],
+            num_nodes=config["num_nodes"],
+            radio_range=config["radio_range"])
+    if config["protocol"] == "hint":
+        logs = benchmarks.random_waveform_simulation(
+                scenario=scenario,
+                create_router=partial(
+                    benchmarks.create_sim_router,
+                    beacon_interval=config["beacon_interval"],
+                    credit=config["credit"]))
+    else:
+        logs = benchmarks.random_waveform_realtime(
+                scenario=scenario,
+                create_router=partial(
+                    benchmarks.create_hmap_gossip_router,
+                    gossip_level=config["gossip_level"]))
+    name = config_name(config)
+    meta = {
+            **scenario["params"], **config,
+            "title": name,
+            "medium": "des" if config["protocol"] == "hint" else "realtime",
+            "param": config[params[config["protocol"]]]}
+    publish_results(out_dir, name, logs, meta)
+    return name, time.perf_counter() - start
+
+def run_sweep(configs, *, out_dir="./results", processes=None):
+    # runs configs without a result in out_dir on a pool of processes
+    os.makedirs(out_dir, exist_ok=True)
+    todo = [
+            c for c in configs
+            if not os.path.exists(os.path.join(out_dir, config_name(c)))]
+    print(f"{len(configs) - len(todo)} of {len(configs)} configs done")
+    if not todo:
+        return
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        futures = [pool.submit(run_config, c, out_dir) for c in todo]
+        for i, future in enumerate(as_completed(futures)):
+            name, elapsed = future.result()
+            print(f"[{i + 1}/{len(todo)}] {name}: {elapsed:.1f} s")
+
+def sweep():
+    run_sweep(grid(
+            hint=[(5, c) for c in (0, 1, 2, 3)],
+            gossip=(0.1, 0.3, 0.5, 0.7, 0.9, 1),
+            seeds=(32, 47),
+            num_nodes=(100,),
+            radio_ranges=(50, 75, 100)))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Binary trace of transceiver traffic. Each worker writes its own file of
+fixed-width little-endian records, 32 bytes each:
+    i64 nid, f64 time, u32 length, u32 crc32, u8 direction, 7 pad bytes
+At level "counts" length and crc32 are 0, at "sizes" they are filled in
+and at "full" the payloads are also appended, in record order, to a
+"<path>.payload" file next to the records.
+"""
+
+import os
+import struct
+from threading import Lock
+import zlib
+
+import numpy as np
+
+levels = ("counts", "sizes", "full")
+channels = ("send", "recv")
+
+record = struct.Struct("<qdIIB7x")
+dtype = np.dtype([
+        ("nid", "<i8"),
+        ("time", "<f8"),
+        ("length", "<u4"),
+        ("crc32", "<u4"),
+        ("direction", "u1"),
+        ("pad", "V7")])
+assert dtype.itemsize == record.size
+
+
+class TraceRecorder:
+    """
+    Stands in for trx_q: put(("send" | "recv", nid, time, data)) packs a
+    record into a per-process buffer that is written out when it fills and
+    on close. Files are opened lazily, so a recorder can be created in the
+    parent and handed to the worker process that will write it.
+    """
+    def __init__(self, path, *, level="sizes", buffer_records=4096):
+        if level not in levels:
+            raise ValueError(f"unknown trace level: {level}")
+        self.path = path
+        self.level = level
+        self.__buffer_records = buffer_records
+        self.__lock = Lock()
+        self.__buf = bytearray(record.size*buffer_records)
+        self.__n = 0
+        self.__payloads = []
+        self.__f = None
+        self.__payload_f = None
+
+    def __reduce__(self):
+        return (TraceRecorder, (self.path,),
+                {"level": self.level, "buffer_records": self.__buffer_records})
+
+    def __setstate__(self, state):
+        self.__init__(self.path, **state)
+
+    def put(self, item, timeout=None):
+        channel, nid, t, data = item
+        direction = channels.index(channel)
+        with self.__lock:
+            if self.level == "counts":
+                record.pack_into(
+                        self.__buf, self.__n*record.size, nid, t, 0, 0,
+                        direction)
+            else:
+                record.pack_into(
+                        self.__buf, self.__n*record.size, nid, t, len(data),
+                        zlib.crc32(data), direction)
+                if self.level == "full":
+                    self.__payloads.append(data)
+            self.__n += 1
+            if self.__n == self.__buffer_records:
+                self.__flush()
+
+    def __flush(self):
+        if self.__f is None:
+            self.__f = open(self.path, "wb")
+            if self.level == "full":
+                self.__payload_f = open(self.path + ".payload", "wb")
+            elif os.path.exists(self.path + ".payload"):
+                # left over from an earlier full trace at this path
+                os.remove(self.path + ".payload")
+        self.__f.write(memoryview(self.__buf)[:self.__n*record.size])
+        if self.__payload_f is not None:
+            self.__payload_f.write(b"".join(self.__payloads))
+            self.__payloads.clear()
+        self.__n = 0
+
+    def flush(self):
+        with self.__lock:
+            self.__flush()
+
+    def close(self):
+        with self.__lock:
+            self.__flush()
+            self.__f.close()
+            if self.__payload_f is not None:
+                self.__payload_f.close()
+
+
+def read_trace(paths):
+    """
+    Merges the trace files in paths into one record array ordered by time.
+    Returns (records, payloads), payloads being the list of frames matching
+    records when every file has a payload file and None otherwise.
+    """
+    parts = []
+    payloads = []
+    for path in paths:
+        records = np.fromfile(path, dtype=dtype)
+        parts.append(records)
+        if payloads is None or not os.path.exists(path + ".payload"):
+            payloads = None
+            continue
+        with open(path + ".payload", "rb") as f:
+            blob = f.read()
+        ends = np.cumsum(records["length"], dtype=np.int64)
+        if len(blob) != (ends[-1] if len(ends) > 0 else 0):
+            raise ValueError(f"payload file does not match records: {path}")
+        payloads.extend(
+                blob[e - n:e] for e, n in zip(ends.tolist(),
+                    records["length"].tolist()))
+    records = np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+    order = np.argsort(records["time"], kind="stable")
+    if payloads is not None:
+        payloads = [payloads[i] for i in order.tolist()]
+    return records[order], payloads
+
+def trace_logs(paths):
+    # send and recv logs shaped like those random_waveform_benchmark keeps
+    records, payloads = read_trace(paths)
+    if payloads is None:
+        raise ValueError("trace was not recorded at level full")
+    logs = {"send": {}, "recv": {}}
+    for r, data in zip(records.tolist(), payloads):
+        nid, t, length, crc, direction, pad = r
+        logs[channels[direction]].setdefault(nid, []).append((t, data))
+    return logs
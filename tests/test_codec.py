@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from manet.codec import BinaryCodec, PickleCodec, decode_varint, encode_varint
+from manet.destinations import Bloom, Destinations
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+# small ids take the fixed-width fast paths, mixed ones the varint paths
+small = {1: 0, 5: 3, 127: 10}
+mixed = {1: 0, 0x80: 2, 3: 1, 300: 7, 2**40: 255}
+
+messages = [
+    ("message", ((1, 2), {}, 0, b"")),
+    ("message", ((3, 4), small, 2, b"event")),
+    ("message", ((2**33, 2**20), mixed, 1, b"\x00\xff"*100)),
+    ("beacon", (7, 1, 0xdeadbeef, (b"a", b"bc"))),
+    ("beacon", (300, 0, 0, ())),
+    ("delta", (7, 3, 12, 2, (b"added",), (b"gone", b""))),
+    ("digest", (2**20, 5, 0xffffffff)),
+    ("fragment", ((9, 1000), 3, 4, b"chunk")),
+    ("fragment", ((9, 0), 0, 1, b"")),
+]
+
+
+def indexed(destinations, bloom=None):
+    d = Destinations.from_dict(destinations, bloom=bloom)
+    return ("message", ((5, 6), d, 1, b"event"))
+
+indexed_messages = [
+    indexed({}),
+    indexed(small),
+    indexed(mixed),
+    indexed(small, bloom=Bloom(64)), # hint 0 moves into the filter
+    indexed({2: 1, 200: 3}, bloom=Bloom(128, k=2)),
+]
+
+
+def test_varint():
+    for n in (0, 1, 0x7f, 0x80, 0x3fff, 0x4000, 2**63 - 1):
+        out = bytearray()
+        encode_varint(n, out)
+        assert decode_varint(out, 0) == (n, len(out))
+    with pytest.raises(ValueError):
+        encode_varint(-1, bytearray())
+    with pytest.raises(ValueError):
+        decode_varint(b"\x80", 0)
+
+@pytest.mark.parametrize("msg", messages)
+def test_round_trip(msg):
+    codec = BinaryCodec()
+    assert codec.decode(codec.encode([msg])) == [msg]
+
+@pytest.mark.parametrize("msg", indexed_messages)
+def test_indexed_round_trip(msg):
+    codec = BinaryCodec()
+    [(channel, content)] = codec.decode(codec.encode([msg]))
+    assert channel == "message"
+    assert content == msg[1] # Destinations compare by ids, hints and bloom
+
+def test_frame_round_trip():
+    codec = BinaryCodec()
+    frame = messages + indexed_messages
+    assert codec.decode(codec.encode(frame)) == frame
+    assert codec.decode(codec.encode([])) == []
+
+def test_mixed_ids_keep_order_and_hints():
+    codec = BinaryCodec()
+    msg = ("message", ((1, 1), {2**40: 1, 1: 2, 0x80: 3}, 0, b""))
+    [(_, (_, destinations, _, _))] = codec.decode(codec.encode([msg]))
+    assert list(destinations.items()) == [(2**40, 1), (1, 2), (0x80, 3)]
+
+def test_encode_rejects_unencodable():
+    codec = BinaryCodec()
+    with pytest.raises(ValueError):
+        codec.encode([("message", ((1, 1), {1: 256}, 0, b""))])
+    with pytest.raises(ValueError):
+        codec.encode([("message", ((1, 1), {-1: 0}, 0, b""))])
+    with pytest.raises(ValueError):
+        codec.encode([("unknown", ())])
+
+@pytest.mark.parametrize("msg", messages + indexed_messages)
+def test_truncated(msg):
+    codec = BinaryCodec()
+    data = codec.encode([msg])
+    for n in range(len(data)):
+        with pytest.raises(ValueError):
+            codec.decode(data[:n])
+
+def test_malformed():
+    codec = BinaryCodec()
+    data = codec.encode(messages)
+    with pytest.raises(ValueError):
+        codec.decode(data + b"\x00") # trailing bytes
+    with pytest.raises(ValueError):
+        codec.decode(b"\x01\x7f") # unknown message type
+    rng = np.random.default_rng(47)
+    for _ in range(2000): # random corruption never raises anything else
+        corrupt = bytearray(data)
+        for i in rng.integers(0, len(data), 3):
+            corrupt[i] = rng.integers(0, 256)
+        try:
+            codec.decode(bytes(corrupt))
+        except ValueError:
+            pass
+
+def test_pickle_codec():
+    codec = PickleCodec()
+    assert list(codec.decode(codec.encode(messages))) == messages
+    with pytest.raises(ValueError):
+        codec.decode(b"not a pickle")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from manet.destinations import Bloom, Destinations
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+
+def dict_merge(destinations, nids, hints):
+    # the rule on_message applied to the destinations dict
+    lowest = None
+    for nid, hint in zip(nids, hints):
+        if hint < destinations.get(nid, 256):
+            destinations[nid] = hint
+            lowest = hint if lowest is None else min(lowest, hint)
+    return lowest
+
+def random_steps(rng, steps=200, nodes=500):
+    for _ in range(steps):
+        nids = rng.choice(nodes, size=rng.integers(0, 20), replace=False)
+        yield nids, rng.integers(0, 256, size=len(nids))
+
+
+def test_merge_matches_dict():
+    rng = np.random.default_rng(0)
+    expected = {}
+    indexed = Destinations()
+    for nids, hints in random_steps(rng):
+        before = indexed
+        lowest = dict_merge(expected, nids.tolist(), hints.tolist())
+        indexed, applied = indexed.merge(nids, hints)
+        assert applied == lowest
+        assert dict(indexed.items()) == expected
+        assert np.all(np.diff(indexed.ids) > 0)
+        if lowest is None:
+            assert indexed is before
+    assert Destinations.from_dict(expected) == indexed
+
+def test_merge_leaves_self_untouched():
+    destinations = Destinations.from_dict({3: 5, 1: 7})
+    merged, applied = destinations.merge([2, 3], [1, 1])
+    assert applied == 1
+    assert dict(destinations.items()) == {1: 7, 3: 5}
+    assert dict(merged.items()) == {1: 7, 2: 1, 3: 1}
+    assert destinations.merge([], []) == (destinations, None)
+
+def test_max_size():
+    rng = np.random.default_rng(1)
+    expected = {}
+    capped = Destinations(max_size=16)
+    for nids, hints in random_steps(rng):
+        dict_merge(expected, nids.tolist(), hints.tolist())
+        capped, _ = capped.merge(nids, hints)
+        assert len(capped) <= 16
+        assert np.all(np.diff(capped.ids) > 0)
+        # a kept entry never carries a hint above what the dict holds
+        for nid, hint in capped.items():
+            assert hint >= expected[nid]
+    kept = Destinations.from_dict({1: 9, 2: 3, 3: 3, 4: 0}, max_size=2)
+    assert dict(kept.items()) == {2: 3, 4: 0}
+
+def test_bloom_has_no_false_negatives():
+    rng = np.random.default_rng(2)
+    for bits, k in ((64, 1), (512, 3), (4096, 6)):
+        bloom = Bloom(bits, k)
+        added = rng.integers(-2**40, 2**40, size=300)
+        for chunk in np.array_split(added, 7):
+            bloom.add(chunk)
+            assert bloom.contains(chunk).all()
+        assert bloom.contains(added).all()
+        copy = Bloom(bits, k, bloom.data.tobytes())
+        assert copy.contains(added).all()
+    assert not Bloom().contains(np.arange(100)).any()
+    with pytest.raises(ValueError):
+        Bloom(k=0)
+
+def test_bloom_destinations():
+    rng = np.random.default_rng(3)
+    reached = set()
+    destinations = Destinations(bloom=Bloom(256, 3))
+    for nids, hints in random_steps(rng):
+        hints[rng.random(len(hints)) < 0.3] = 0
+        destinations, _ = destinations.merge(nids, hints)
+        reached.update(nids[hints == 0].tolist())
+        # reached nodes leave the arrays for the filter and stay there
+        assert not (destinations.hints == 0).any()
+        assert destinations.bloom.contains(sorted(reached)).all()
+        merged, applied = destinations.merge(
+                sorted(reached), [0]*len(reached))
+        assert merged is destinations and applied is None
+    assert destinations.values()[-1] == 0
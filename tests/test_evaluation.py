@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+
+import pytest
+
+plt = pytest.importorskip("matplotlib.pyplot")
+
+from manet import evaluation
+from manet.results import publish_results
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+logs = {
+        "pub": {1: [(0, 1.0)]},
+        "sub": {2: {0: [(1.5, (1, 1.0))]}},
+        "send": {1: [(1.0, b"abc")], 2: []},
+        "recv": {1: [], 2: [(1.1, b"abc")]},
+        "paths": {nid: [(nid, 0, 0)] for nid in range(100)}}
+
+
+def test_benchmark_then_plot(tmp_path, monkeypatch):
+    # converted pickles and a benchmark rerun of the same trial, hint 2
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(evaluation, "metrics", None)
+    monkeypatch.setattr(plt, "show", lambda: plt.close("all"))
+    os.makedirs("pickles")
+    with open("pickles/hint_2_seed_47.pickle", "wb") as f:
+        pickle.dump(logs, f)
+    os.utime("pickles/hint_2_seed_47.pickle", (0, 0)) # an old run
+    name = "hint_2_seed_47_b5_n100_r75_realtime"
+    meta = {
+            "protocol": "hint", "param": 2, "seed": 47, "num_nodes": 100,
+            "radio_range": 75, "medium": "realtime"}
+    publish_results("results", name, logs, meta)
+    registry, [trial] = evaluation.get_trials()
+    assert os.path.basename(trial.path) == name
+    assert os.path.isdir("results/hint_2_seed_47") # converted all the same
+    evaluation.plot_all() # every plot with the default selection
+    assert list(evaluation.get_metrics()["reliability"]) == ["hint 2"]
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import queue
+
+import pytest
+
+pytest.importorskip("hmap")
+
+from hmap.std import Node
+from hmap.std.matching import TopicBasedMatcher
+
+from manet.benchmarks import create_sim_router
+from manet.context import RouterContext, SimulationContext
+from manet.mobility import Mobility
+from manet.simulator import Medium, SimTransceiver, Simulator, VirtualClock
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+# publisher 1 and subscriber 2 stand still within range of each other
+paths = {1: [(0, 0, 0), (0, 0, 100)], 2: [(10, 0, 0), (10, 0, 100)]}
+
+
+@pytest.mark.parametrize("mtu", [None, 64]) # 64 bytes fragments events
+def test_publish_after_migration(mtu):
+    simulator = Simulator()
+    clock = VirtualClock(simulator)
+    mobility = Mobility(paths)
+    medium = Medium(
+            simulator, data_rate=2000, send_range=50, recv_range=50,
+            max_buffer_size=1024)
+    trx_q = queue.SimpleQueue()
+
+    def start_node(nid, incarnation=0):
+        v = mobility.vehicle(nid)
+        trx = SimTransceiver(
+                nid, trx_q, medium=medium,
+                context=SimulationContext(clock=clock, vehicle=v))
+        router = create_sim_router(
+                context=RouterContext(clock=clock, vehicle=v, uid=nid),
+                matcher=TopicBasedMatcher("FlatInt", "PyObj"),
+                transceiver=trx, interest_cache=None, simulator=simulator,
+                beacon_interval=1, mtu=mtu, incarnation=incarnation)
+        return Node(router)
+
+    delivered = []
+    publisher = start_node(1)
+    subscriber = start_node(2)
+    subscriber.subscribe(0, lambda t, msg: delivered.append(msg))
+    clock.start()
+    payload = "x"*100
+    for i in range(3):
+        simulator.schedule(
+                2 + i, lambda i=i: publisher.publish(0, (i, payload)))
+    simulator.run(until=6)
+    assert [i for i, _ in delivered] == [0, 1, 2]
+    # the publisher moves to another process, which runs a new router for
+    # it while the subscriber still remembers the old one's messages
+    publisher.close()
+    publisher = start_node(1, incarnation=1)
+    simulator.schedule(8, lambda: publisher.publish(0, (3, payload)))
+    simulator.run(until=10)
+    assert [i for i, _ in delivered] == [0, 1, 2, 3]
+    publisher.close()
+    subscriber.close()
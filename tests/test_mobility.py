@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+
+import numpy as np
+
+from manet.mobility import Mobility
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+paths = {
+    7: [(0, 0, 0), (10, 0, 1), (10, 20, 3)],
+    3: [(5, 5, 0)], # parked
+}
+
+
+def test_interpolation():
+    m = Mobility(paths)
+    v, parked = m.vehicle(7), m.vehicle(3)
+    m.step(0.5)
+    assert (v.x, v.y, v.x_vel, v.y_vel) == (5, 0, 10, 0)
+    m.step(2)
+    assert (v.x, v.y, v.x_vel, v.y_vel) == (10, 10, 0, 10)
+    m.step(100) # parks at the last waypoint
+    assert (v.x, v.y, v.x_vel, v.y_vel) == (10, 20, 0, 0)
+    assert (parked.x, parked.y, parked.x_vel, parked.y_vel) == (5, 5, 0, 0)
+
+def test_readers_only_see_positions():
+    # every position a reader sees lies on the path, never mid-computation
+    m = Mobility({0: [(100, 100, 0), (200, 100, 1000)]})
+    v = m.vehicle(0)
+    done = threading.Event()
+    seen = []
+    def read():
+        while not done.is_set():
+            seen.append((v.x, v.y))
+    reader = threading.Thread(target=read)
+    reader.start()
+    for t in np.linspace(0, 1000, 20000):
+        m.step(t)
+    done.set()
+    reader.join()
+    xs, ys = np.array(seen).T
+    assert len(seen) > 0
+    assert ((xs >= 100) & (xs <= 200)).all() and (ys == 100).all()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from manet.codec import BinaryCodec
+from manet.packer import FramePacker, Reassembler
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+
+def message(seq, size, hint=1):
+    event = (bytes(range(256))*(size//256 + 1))[:size]
+    return ("message", ((1, seq), {2: hint}, 0, event))
+
+def unpack(codec, frames, reassembler=None, t=0):
+    # messages of frames in order, fragments replaced by what they carry
+    reassembler = reassembler or Reassembler()
+    messages = []
+    for frame in frames:
+        for channel, content in codec.decode(frame):
+            if channel != "fragment":
+                messages.append((channel, content))
+                continue
+            data = reassembler.add(content, t)
+            if data is not None:
+                messages.extend(codec.decode(data))
+    return messages
+
+def fragments(size, mtu=100):
+    codec = BinaryCodec()
+    frames = FramePacker(codec, mtu, 7).pack([message(0, size)])
+    return [content for frame in frames for _, content in codec.decode(frame)]
+
+
+@pytest.mark.parametrize("mtu", [40, 100, 1500])
+def test_pack_round_trip(mtu):
+    codec = BinaryCodec()
+    packer = FramePacker(codec, mtu, 7)
+    messages = [
+            message(i, size, hint=i % 3)
+            for i, size in enumerate((0, 10, 30, 200, 5, 3000, 60))]
+    frames = packer.pack(messages)
+    assert all(len(frame) <= mtu for frame in frames)
+    key = lambda m: m[1][0]
+    assert sorted(unpack(codec, frames), key=key) == messages
+    # urgent messages (hint 0) lead the frames
+    first = codec.decode(frames[0])[0]
+    assert first[0] == "fragment" or packer.urgent(first)
+    assert packer.stats["oversized"] == 0
+    # every byte but each frame's message count belongs to some channel
+    channel_bytes = packer.stats["channel_bytes"]
+    assert list(channel_bytes) == ["message"]
+    assert channel_bytes["message"] + len(frames) == sum(map(len, frames))
+
+def test_fragments_in_any_order():
+    codec = BinaryCodec()
+    pieces = fragments(1000)
+    assert len(pieces) > 1
+    reassembler = Reassembler()
+    for piece in reversed(pieces[1:]):
+        assert reassembler.add(piece, 0) is None
+    data = reassembler.add(pieces[0], 0)
+    assert codec.decode(data) == [message(0, 1000)]
+    assert reassembler.stats == {"pending": 0, "reassembled": 1, "dropped": 0}
+
+def test_mtu_too_small():
+    with pytest.raises(ValueError):
+        FramePacker(BinaryCodec(), 10, 7)
+    FramePacker(BinaryCodec(), 40, 7).pack([message(0, 1000)])
+
+def test_inconsistent_count():
+    pieces = fragments(1000)
+    reassembler = Reassembler()
+    fid, index, count, chunk = pieces[0]
+    assert reassembler.add(pieces[0], 0) is None
+    # claims the frame is complete with the chunk just seen
+    assert reassembler.add((fid, 1, 2, chunk), 0) is None
+    for piece in pieces[1:]: # the rest no longer complete a frame
+        assert reassembler.add(piece, 0) is None
+    assert reassembler.stats["reassembled"] == 0
+    assert reassembler.stats["dropped"] == 1
+
+@pytest.mark.parametrize("index, count", [(-1, 3), (3, 3), (0, 0)])
+def test_index_out_of_range(index, count):
+    reassembler = Reassembler()
+    assert reassembler.add(((7, 0), index, count, b"x"), 0) is None
+    assert reassembler.stats["pending"] == 0
+
+def test_duplicates_and_expiry():
+    codec = BinaryCodec()
+    pieces = fragments(1000)
+    reassembler = Reassembler(ttl=10)
+    for piece in pieces[:-1]:
+        reassembler.add(piece, 0)
+        reassembler.add(piece, 0) # duplicate
+    assert codec.decode(reassembler.add(pieces[-1], 0)) == [message(0, 1000)]
+    for piece in pieces[:-1]:
+        reassembler.add(piece, 0)
+    assert reassembler.add(pieces[-1], 10) is None # expired meanwhile
+    assert reassembler.stats["dropped"] == 1
+    reassembler = Reassembler(max_size=1)
+    reassembler.add(pieces[0], 0)
+    reassembler.add(((8, 0), 0, 2, b"x"), 0) # pushes out the first
+    assert reassembler.stats == {"pending": 1, "reassembled": 0, "dropped": 1}
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from manet.partition import owner, rebalance_plan, spatial_partition
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+# nodes 0-3 start on the left and 4-7 on the right, 2, 3, 6 and 7 cross over
+start = [0, 0, 0, 0, 100, 100, 100, 100]
+end = [0, 0, 100, 100, 100, 100, 0, 0]
+paths = {nid: [(start[nid], nid, 0), (end[nid], nid, 10)] for nid in range(8)}
+
+
+def test_spatial_partition():
+    positions = {nid: (x, y) for nid, [(x, y, t), _] in paths.items()}
+    parts = spatial_partition(positions, 2)
+    assert sorted(map(sorted, parts)) == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert sorted(sum(spatial_partition(positions, 8), [])) == list(range(8))
+
+@pytest.mark.parametrize("num_parts", [0, 9])
+def test_spatial_partition_rejects_empty_parts(num_parts):
+    positions = {nid: (nid, 0) for nid in range(8)}
+    with pytest.raises(ValueError):
+        spatial_partition(positions, num_parts)
+
+def test_rebalance_plan():
+    [(t, parts, migrations)] = rebalance_plan(paths, 2)
+    assert (t, migrations) == (0, 0)
+    plan = rebalance_plan(paths, 2, interval=9, duration=10)
+    assert [(t, m) for t, parts, m in plan] == [(0, 0), (9, 4)]
+    assert owner(plan, 0, 9) == owner(plan, 0, 0) # stayed put
+    i = owner(plan, 2, 0)
+    assert owner(plan, 2, 8.9) == i
+    assert owner(plan, 2, 9) != i # crossed over into the other part
+    with pytest.raises(KeyError):
+        owner(plan, 8, 0)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from manet.registry import TrialRegistry, newest
+from manet.results import publish_results
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+logs = {
+        "pub": {1: [(0, 1.0)]},
+        "sub": {2: {0: [(1.5, (1, 1.0))]}},
+        "send": {1: [(1.0, b"abc")], 2: []},
+        "recv": {1: [], 2: [(1.1, b"abc")]},
+        "paths": {1: [(0, 0, 0)], 2: [(1, 1, 0)]}}
+
+
+def publish(out_dir, name, **meta):
+    publish_results(str(out_dir), name, logs, {"title": name, **meta})
+
+def test_select_by_network_and_medium(tmp_path):
+    publish(
+            tmp_path, "hint_2_seed_47_b5_n100_r75",
+            protocol="hint", param=2, seed=47, num_nodes=100,
+            radio_range=75, medium="des")
+    publish(
+            tmp_path, "hint_2_seed_47_b5_n100_r50",
+            protocol="hint", param=2, seed=47, num_nodes=100,
+            radio_range=50, medium="des")
+    publish(tmp_path, "gossip_0_5_seed_47") # parsed from the name
+    publish(tmp_path, "hint_2_seed_47_b5_n2_r75_des")
+    registry = TrialRegistry(os.path.join(tmp_path, "*"))
+    [t] = registry.select(radio_range=50)
+    assert (t.title, t.num_nodes, t.medium) == ("hint 2", 100, "des")
+    [t] = registry.select(protocol="gossip")
+    assert (t.title, t.seed, t.num_nodes) == ("gossip 0.5", 47, 2)
+    assert (t.radio_range, t.medium) == (None, "realtime")
+    [t] = registry.select(num_nodes=2, medium="des")
+    assert (t.title, t.radio_range) == ("hint 2", 75)
+
+def test_duplicate_titles(tmp_path):
+    publish(tmp_path, "hint_2_seed_47_b5_n2_r75_des")
+    publish(tmp_path, "hint_2_seed_47_b5_n2_r75_realtime")
+    registry = TrialRegistry(os.path.join(tmp_path, "*"))
+    with pytest.raises(ValueError):
+        registry.table()
+    assert list(registry.table(registry.select(medium="des"))["cost"]) == [
+            "hint 2"]
+
+def test_publish_keeps_or_replaces(tmp_path):
+    publish(tmp_path, "a", seed=1)
+    publish(tmp_path, "a", seed=2) # kept
+    assert TrialRegistry(os.path.join(tmp_path, "*")).trials[0].seed == 1
+    publish_results(str(tmp_path), "a", logs, {"seed": 3}, replace=True)
+    assert TrialRegistry(os.path.join(tmp_path, "*")).trials[0].seed == 3
+    assert os.listdir(tmp_path) == ["a"]
+
+def test_newest(tmp_path):
+    publish(tmp_path, "hint_2_seed_47", created=2)
+    publish(tmp_path, "hint_2_seed_47_b5_n2_r75_realtime", created=3)
+    publish(tmp_path, "hint_2_seed_47_b5_n2_r75_des", created=1)
+    publish(tmp_path, "gossip_0_5_seed_47", created=0)
+    registry = TrialRegistry(os.path.join(tmp_path, "*"))
+    trials = newest(registry.trials)
+    assert [os.path.basename(t.path) for t in trials] == [
+            "gossip_0_5_seed_47", "hint_2_seed_47_b5_n2_r75_realtime"]
+    assert list(registry.table(trials)["cost"]) == ["gossip 0.5", "hint 2"]
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+import random
+
+from manet.scheduler import Scheduler
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+
+def test_pop_due_in_time_order():
+    s = Scheduler()
+    assert s.next_deadline() == math.inf
+    assert s.pop_due(10) == []
+    for key, t in (("c", 3), ("a", 1), ("b", 2), ("d", 2)):
+        s.schedule(key, t, key)
+    assert len(s) == 4 and "a" in s
+    assert s.next_deadline() == 1
+    assert s.pop_due(0.5) == []
+    assert s.pop_due(2) == ["a", "b", "d"] # ties in scheduling order
+    assert "a" not in s
+    assert s.next_deadline() == 3
+    assert s.pop_due(3) == ["c"]
+    assert len(s) == 0 and s.next_deadline() == math.inf
+
+def test_cancel():
+    s = Scheduler()
+    s.schedule("a", 1, "a")
+    s.schedule("b", 2, "b")
+    s.cancel("a")
+    s.cancel("a") # twice, or never scheduled, is fine
+    s.cancel("z")
+    assert "a" not in s and len(s) == 1
+    assert s.next_deadline() == 2 # dead entry skipped
+    assert s.pop_due(5) == ["b"]
+
+def test_reschedule():
+    s = Scheduler()
+    s.schedule("a", 1, "first")
+    s.schedule("b", 2, "b")
+    s.schedule("a", 3, "second") # later, the old entry must not fire
+    assert len(s) == 2
+    assert s.pop_due(2) == ["b"]
+    assert s.pop_due(3) == ["second"]
+    s.schedule("a", 5, "later")
+    s.schedule("a", 4, "sooner")
+    assert s.next_deadline() == 4
+    assert s.pop_due(10) == ["sooner"]
+
+def test_against_sorting():
+    # many schedules, reschedules and cancels, compacting along the way
+    rng = random.Random(47)
+    s = Scheduler()
+    live = {}
+    for i in range(5000):
+        key = rng.randrange(200)
+        if rng.random() < 0.3:
+            s.cancel(key)
+            live.pop(key, None)
+        else:
+            t = rng.random()*100
+            s.schedule(key, t, (key, i))
+            live[key] = (t, i)
+    assert len(s) == len(live)
+    expected = sorted(live.items(), key=lambda kv: kv[1])
+    assert s.next_deadline() == expected[0][1][0]
+    assert s.pop_due(50) == [
+            (key, i) for key, (t, i) in expected if t <= 50]
+    assert s.pop_due(100) == [
+            (key, i) for key, (t, i) in expected if t > 50]
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import deque
+from multiprocessing import Process
+import pickle
+import queue
+import random
+
+import pytest
+
+from manet.shm import ShmLogQueue, ShmRing
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+
+@pytest.fixture
+def ring():
+    ring = ShmRing(capacity=64)
+    yield ring
+    ring.close()
+
+
+def test_empty_and_full(ring):
+    assert ring.empty() and ring.try_get() is None
+    assert ring.try_put(b"a"*28) # 4 + 28 bytes
+    assert ring.try_put(b"b"*28) # exactly full
+    assert not ring.try_put(b"")
+    with pytest.raises(queue.Full):
+        ring.put(b"c", timeout=0.01)
+    assert ring.get() == b"a"*28
+    assert ring.try_put(b"c"*20) # wraps into the space freed
+    assert ring.get() == b"b"*28
+    assert ring.get() == b"c"*20
+    assert ring.empty()
+    with pytest.raises(queue.Empty):
+        ring.get(timeout=0.01)
+
+def test_too_large(ring):
+    # half the ring, fits wherever the last frame left off
+    for offset in range(29):
+        ring.put(b"o"*offset)
+        assert ring.get() == b"o"*offset
+        ring.put(b"x"*28, timeout=1)
+        assert ring.get() == b"x"*28
+    with pytest.raises(ValueError):
+        ring.try_put(b"x"*29)
+
+def test_wrap_around(ring):
+    # lengths that leave 0 to 3 bytes at the end (no room for a WRAP
+    # marker) as well as ones that need the marker
+    rng = random.Random(47)
+    expected = deque()
+    for i in range(5000):
+        if expected and rng.random() < 0.5:
+            assert ring.try_get() == expected.popleft()
+            continue
+        if not expected:
+            assert ring.try_get() is None
+        frame = bytes([i % 256])*rng.randrange(0, 29)
+        if ring.try_put(frame):
+            expected.append(frame)
+        else: # full, frees once enough is read
+            assert expected
+    while expected:
+        assert ring.try_get() == expected.popleft()
+    assert ring.empty()
+
+def test_pickled_ring_attaches(ring):
+    other = pickle.loads(pickle.dumps(ring))
+    try:
+        assert other.name == ring.name
+        other.put(b"frame")
+        assert ring.get() == b"frame"
+    finally:
+        other.close() # only the creator unlinks
+
+def produce(ring, n):
+    for i in range(n):
+        ring.put(i.to_bytes(4, "little")*(i % 7))
+
+def test_across_processes():
+    ring = ShmRing(capacity=256)
+    try:
+        p = Process(target=produce, args=(ring, 2000))
+        p.start()
+        for i in range(2000):
+            assert ring.get(timeout=10) == i.to_bytes(4, "little")*(i % 7)
+        p.join()
+        assert ring.empty()
+    finally:
+        ring.close()
+
+def test_log_queue(ring):
+    q = ShmLogQueue(ring)
+    assert q.empty()
+    q.put(("send", 7, 1.5, b"data"))
+    q.put(("recv", -1, 2.0, b""))
+    assert q.get() == ("send", 7, 1.5, b"data")
+    assert q.get_nowait() == ("recv", -1, 2.0, b"")
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
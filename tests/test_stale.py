@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from manet.stale import StaleCache
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+
+def test_ttl_expiry():
+    cache = StaleCache(ttl=10)
+    cache.add((1, 0), 0)
+    cache.add((1, 1), 5)
+    assert (1, 0) in cache and (1, 1) in cache
+    assert (2, 0) not in cache
+    cache.add((1, 2), 9.9) # nothing old enough yet
+    assert len(cache) == 3
+    cache.add((1, 3), 10) # (1, 0) reached ttl
+    assert (1, 0) not in cache and len(cache) == 3
+    cache.add((1, 4), 30) # everything else too
+    assert not any(mid in cache for mid in [(1, 1), (1, 2), (1, 3)])
+    stats = cache.stats
+    assert (stats["size"], stats["expired"], stats["evicted"]) == (1, 4, 0)
+    assert stats["inserts"] == 5 and stats["hits"] == 2
+
+def test_refresh_moves_to_end():
+    cache = StaleCache(ttl=10)
+    cache.add("a", 0)
+    cache.add("b", 1)
+    cache.add("a", 2) # seen again, lives on from now
+    cache.add("c", 11) # expires b but not a
+    assert "a" in cache and "b" not in cache
+    assert cache.stats["inserts"] == 3
+
+def test_max_size_evicts_oldest():
+    cache = StaleCache(ttl=100, max_size=3)
+    for i in range(5):
+        cache.add(i, i)
+    assert len(cache) == 3
+    assert [i in cache for i in range(5)] == [False, False, True, True, True]
+    stats = cache.stats
+    assert (stats["evicted"], stats["expired"]) == (2, 0)
+    # newest early eviction was 3 s old when it went (1 evicted at t=4)
+    assert stats["youngest_evicted_age"] == 3
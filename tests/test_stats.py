@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from threading import Thread
+
+from manet.stats import Histogram, Stats, TimedLock, merge_stats
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+
+def test_histogram():
+    h = Histogram()
+    for value in (0, 1, 3, 4, 2**40):
+        h.add(value)
+    d = h.as_dict()
+    assert (d["count"], d["max"], d["total"]) == (5, 2**40, 8 + 2**40)
+    assert d["buckets"][:4] == [1, 1, 1, 1] and sum(d["buckets"]) == 5
+    assert Histogram().as_dict()["mean"] is None
+
+def test_merge_stats():
+    a, b = Stats(counters=("sent",)), Stats()
+    a.count("sent", 2)
+    b.count("sent")
+    b.count("lost")
+    a.timer("encode").add(1e-6)
+    b.timer("encode").add(1e-3)
+    merged = merge_stats([a.as_dict(), b.as_dict()])
+    assert merged["counters"] == {"sent": 3, "lost": 1}
+    encode = merged["histograms"]["encode"]
+    assert (encode["count"], encode["max"]) == (2, 1e-3)
+    assert sum(encode["buckets"]) == 2
+    assert encode["mean"] == (1e-6 + 1e-3)/2
+
+def test_timed_lock_from_several_threads():
+    timer = Stats().timer("lock_wait")
+    lock = TimedLock(timer)
+    shared = [0]
+    def work():
+        for _ in range(20000):
+            with lock:
+                shared[0] += 1
+    threads = [Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert shared[0] == 80000
+    # contended waits only, count and buckets updated together
+    assert timer.count <= 80000
+    assert sum(timer.buckets) == timer.count
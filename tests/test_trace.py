@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+import zlib
+
+import pytest
+
+from manet.trace import TraceRecorder, read_trace, trace_logs
+
+__author__ = "gregjhansell97"
+__copyright__ = "gregjhansell97"
+__license__ = "mit"
+
+# what two workers' transceivers logged, interleaved in time
+worker_items = [
+    [("send", 1, 0.5, b"hello"), ("recv", 1, 2.0, b""),
+        ("send", 1, 3.0, b"\x00"*300)],
+    [("recv", 2, 0.75, b"hello"), ("send", -5, 1.0, b"x"),
+        ("recv", 2, 3.0, b"\x00"*300)]]
+
+
+def record_all(tmp_path, level, buffer_records=2):
+    paths = []
+    for i, items in enumerate(worker_items):
+        path = os.path.join(tmp_path, f"worker_{i}.trace")
+        recorder = TraceRecorder(
+                path, level=level, buffer_records=buffer_records)
+        recorder = pickle.loads(pickle.dumps(recorder)) # as sent to a worker
+        for item in items:
+            recorder.put(item)
+        recorder.close()
+        paths.append(path)
+    return paths
+
+def merged():
+    items = [item for items in worker_items for item in items]
+    return sorted(items, key=lambda item: item[2]) # stable, like the reader
+
+
+@pytest.mark.parametrize("level", ["counts", "sizes", "full"])
+def test_round_trip(tmp_path, level):
+    records, payloads = read_trace(record_all(tmp_path, level))
+    expected = merged()
+    assert [
+            (["send", "recv"][r["direction"]], r["nid"], r["time"])
+            for r in records] == [item[:3] for item in expected]
+    if level == "counts":
+        assert not records["length"].any() and not records["crc32"].any()
+    else:
+        assert records["length"].tolist() == [
+                len(item[3]) for item in expected]
+        assert records["crc32"].tolist() == [
+                zlib.crc32(item[3]) for item in expected]
+    if level == "full":
+        assert payloads == [item[3] for item in expected]
+    else:
+        assert payloads is None
+
+def test_trace_logs(tmp_path):
+    logs = trace_logs(record_all(tmp_path, "full", buffer_records=4096))
+    assert logs["send"] == {
+            1: [(0.5, b"hello"), (3.0, b"\x00"*300)], -5: [(1.0, b"x")]}
+    assert logs["recv"] == {2: [(0.75, b"hello"), (3.0, b"\x00"*300)],
+            1: [(2.0, b"")]}
+    with pytest.raises(ValueError):
+        trace_logs(record_all(tmp_path, "sizes"))
+
+def test_truncated_payloads(tmp_path):
+    paths = record_all(tmp_path, "full")
+    with open(paths[0] + ".payload", "r+b") as f:
+        f.truncate(3)
+    with pytest.raises(ValueError):
+        read_trace(paths)
+
+def test_empty_and_unknown_level(tmp_path):
+    path = os.path.join(tmp_path, "empty.trace")
+    TraceRecorder(path).close()
+    records, payloads = read_trace([path])
+    assert len(records) == 0 and payloads is None
+    records, payloads = read_trace([])
+    assert len(records) == 0
+    with pytest.raises(ValueError):
+        TraceRecorder(path, level="everything")